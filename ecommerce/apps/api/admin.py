@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import Order, OrderItem, User
+from .models import (
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OrderRollup,
+    ProductSales,
+    RequestProfile,
+    Task,
+    User,
+)
 
 # Register your models here.
 
@@ -10,8 +19,55 @@ class OrderItemInLine(admin.TabularInline):
 
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInLine]
+    readonly_fields = ["total_price"]
 
 
 admin.site.register(Order, OrderAdmin)
 admin.site.register(User)
 
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ["created_at", "view", "method", "status_code", "duration_ms", "queries", "reason"]
+    list_filter = ["reason", "view"]
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+
+
+class ProductSalesAdmin(admin.ModelAdmin):
+    list_display = ["product", "units_sold", "revenue", "orders"]
+    ordering = ["-units_sold"]
+    readonly_fields = [field.name for field in ProductSales._meta.fields]
+
+
+admin.site.register(ProductSales, ProductSalesAdmin)
+
+
+class OrderRollupAdmin(admin.ModelAdmin):
+    list_display = ["bucket", "status", "orders", "revenue"]
+    list_filter = ["status"]
+    date_hierarchy = "bucket"
+    readonly_fields = [field.name for field in OrderRollup._meta.fields]
+
+
+admin.site.register(OrderRollup, OrderRollupAdmin)
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ["name", "status", "attempts", "run_at", "finished_at", "worker"]
+    list_filter = ["status", "name"]
+    readonly_fields = [field.name for field in Task._meta.fields]
+
+
+admin.site.register(Task, TaskAdmin)
+
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ["key", "user", "status_code", "created_at", "expires_at"]
+    list_filter = ["status_code"]
+    search_fields = ["key"]
+    readonly_fields = [field.name for field in IdempotencyKey._meta.fields]
+
+
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+
+from apps.api.models import Order, OrderRollup
+
+"""
+   Order counts and revenue per hour and status, kept in OrderRollup.
+
+   Every write that changes an order's status, total or existence applies
+   a signed delta to its (hour, status) row: order creation and status
+   changes queue it as a task (apps.api.order_events), the OrderItem total
+   signal and the pre_delete signal apply it inline. Reports
+   then sum at most 24 * 365 * len(statuses) rows for a year instead of
+   scanning the orders. Days and weeks are cut from the hourly rows in
+   TIME_ZONE, exact for zones with whole-hour offsets.
+
+   `backfill_order_rollups` recomputes the rows from the orders, after bulk
+   loads or to repair drift.
+"""
+
+INTERVALS = {
+    "hour": None,
+    "day": TruncDay,
+    "week": TruncWeek,
+}
+# range served when the request doesn't give a start
+DEFAULT_SPANS = {"hour": timedelta(days=2), "day": timedelta(days=30), "week": timedelta(weeks=26)}
+REVENUE = DecimalField(max_digits=14, decimal_places=2)
+
+
+def hour_bucket(created):
+    return created.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def order_change(order, orders=1):
+    """Adds (orders=1) or removes (orders=-1) `order` from its rollup row."""
+    return order.create_at, order.status, orders, orders * order.total_price
+
+
+def record_order_changes(changes):
+    """Apply (created_at, status, orders, revenue) deltas to the rollup rows.
+
+    Three queries however many rows change, with the rows locked in
+    (bucket, status) order so concurrent writers can't deadlock.
+    """
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for created, status, orders, revenue in changes:
+        total = totals[hour_bucket(created), status]
+        total[0] += orders
+        total[1] += revenue
+    totals = {key: total for key, total in totals.items() if any(total)}
+    if not totals:
+        return
+
+    def by_row(index, output_field):
+        return Case(
+            *(
+                When(bucket=bucket, status=status, then=Value(total[index]))
+                for (bucket, status), total in totals.items()
+            ),
+            default=Value(0),
+            output_field=output_field,
+        )
+
+    with transaction.atomic():
+        OrderRollup.objects.bulk_create(
+            [OrderRollup(bucket=bucket, status=status) for bucket, status in totals],
+            ignore_conflicts=True,
+        )
+        rows = OrderRollup.objects.filter(
+            reduce(or_, (Q(bucket=bucket, status=status) for bucket, status in totals))
+        )
+        list(rows.select_for_update().order_by("bucket", "status").values_list("pk"))
+        rows.update(
+            orders=F("orders") + by_row(0, IntegerField()),
+            revenue=F("revenue") + by_row(1, REVENUE),
+        )
+
+
+def backfill_order_rollups(start=None, end=None, batch_size=1000):
+    """Recompute the rollups of the hours in [start, end); returns rows written.
+
+    `start` and `end` are rounded down to the hour; without them every
+    hour is rebuilt. Order writes landing in the range while this runs can
+    be lost.
+    """
+    orders = Order.objects.all()
+    rollups = OrderRollup.objects.all()
+    if start is not None:
+        start = hour_bucket(start)
+        orders = orders.filter(create_at__gte=start)
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        end = hour_bucket(end)
+        orders = orders.filter(create_at__lt=end)
+        rollups = rollups.filter(bucket__lt=end)
+    totals = (
+        orders.annotate(hour=TruncHour("create_at", tzinfo=dt_timezone.utc))
+        .values("hour", "status")
+        .annotate(order_count=Count("pk"), revenue=Sum("total_price"))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        rows = OrderRollup.objects.bulk_create(
+            [
+                OrderRollup(
+                    bucket=row["hour"],
+                    status=row["status"],
+                    orders=row["order_count"],
+                    revenue=row["revenue"],
+                )
+                for row in totals.iterator()
+            ],
+            batch_size=batch_size,
+        )
+    return len(rows)
+
+
+def order_series(interval, start, end, status=None):
+    """Orders and revenue per `interval` bucket and status, in [start, end)."""
+    rows = OrderRollup.objects.filter(bucket__gte=hour_bucket(start), bucket__lt=end)
+    if status:
+        rows = rows.filter(status=status)
+    trunc = INTERVALS[interval]
+    period = F("bucket") if trunc is None else trunc("bucket")
+    return (
+        rows.annotate(period=period)
+        .values("period", "status")
+        .annotate(order_count=Sum("orders"), revenue_total=Sum("revenue"))
+        .filter(order_count__gt=0)
+        .order_by("period", "status")
+    )
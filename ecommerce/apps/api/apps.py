@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.api'
+
+    def ready(self):
+        # registers the signal receivers and the order tasks
+        from apps.api import order_events, signals  # noqa: F401
@@ -0,0 +1,155 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.api.fast_serializers import aserialize_orders, product_rows, serialize_products
+from apps.api.models import Order, Product
+from apps.api.search import search_index_available
+from apps.api.serializers import ProductInfoSerializer, ProductSerializer
+from apps.api.views import (
+    OrderViewSet,
+    ProductInfoListApiView,
+    ProductListCreateApiView,
+)
+
+"""
+   Async-native, read-only twins of the product and order GET endpoints.
+
+   DRF views are sync-only, so these are plain Django async views that reuse
+   the DRF pieces that don't touch the database (filter backends, paginator
+   link building, serializers over already-loaded rows) and do every query
+   through the async ORM. Filtering, pagination and permissions mirror the
+   sync views they're named after; the JSON is the same apart from spacing.
+"""
+
+
+class AsyncAPIView(View):
+    authentication_required = False
+    filter_backends = []
+
+    async def dispatch(self, request, *args, **kwargs):
+        # DRF's Request for query_params, the filter backends expect it, and
+        # for the user its authenticators find
+        self.request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        try:
+            if self.authentication_required:
+                self.user = await self.authenticate()
+                if not self.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.json({"detail": exc.detail}, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                # the first authenticator's, as DRF answers
+                authenticator = self.request.authenticators[0]
+                response["WWW-Authenticate"] = authenticator.authenticate_header(self.request)
+            return response
+
+    async def authenticate(self):
+        """The user REST_FRAMEWORK's authenticators find, as for the sync views.
+
+        They may query (CachedJWTAuthentication on a cache miss, the session
+        backend), so they run on the sync thread.
+        """
+        return await sync_to_async(getattr)(self.request, "user")
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def json(self, data, status=200):
+        return JsonResponse(data, encoder=JSONEncoder, safe=False, status=status)
+
+
+class AsyncProductListView(AsyncAPIView):
+    filter_backends = ProductListCreateApiView.filter_backends
+    filterset_class = ProductListCreateApiView.filterset_class
+    search_fields = ProductListCreateApiView.search_fields
+    ordering_fields = ProductListCreateApiView.ordering_fields
+    pagination_class = ProductListCreateApiView.pagination_class
+    keyset_pagination_class = ProductListCreateApiView.keyset_pagination_class
+    query_budget = 5
+
+    async def get(self, request):
+        params = self.request.query_params
+        if "search" in params:
+            # first call per process introspects the schema, keep it off the loop
+            await sync_to_async(search_index_available)(Product.objects.db)
+        queryset = product_rows(self.filter_queryset(Product.objects.order_by("pk")))
+
+        if params.get("pagination") == "keyset" or "cursor" in params:
+            paginator = self.keyset_pagination_class()
+        else:
+            paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, self.request, view=self)
+        data = paginator.get_paginated_response(serialize_products(page)).data
+        return self.json(data)
+
+
+class AsyncProductDetailView(AsyncAPIView):
+    query_budget = 3
+
+    async def get(self, request, product_id):
+        try:
+            product = await Product.objects.aget(pk=product_id)
+        except Product.DoesNotExist:
+            raise exceptions.NotFound("No Product matches the given query.")
+        return self.json(ProductSerializer(product).data)
+
+
+class AsyncProductInfoView(AsyncAPIView):
+    pagination_class = ProductInfoListApiView.pagination_class
+    ordering_fields = ProductInfoListApiView.ordering_fields
+    query_budget = 4
+
+    async def get(self, request):
+        data = await Product.objects.aaggregate(
+            count=Count("pk"),
+            max_price=Max("price"),
+            min_price=Min("price"),
+            avg_price=Avg("price"),
+            total_stock=Sum("stock"),
+            in_stock_count=Count("pk", filter=Q(stock__gt=0)),
+        )
+        if self.request.query_params.get("products", "").lower() not in ("0", "false"):
+            paginator = self.pagination_class()
+            data["products"] = await paginator.apaginate_queryset(
+                Product.objects.order_by("pk"), self.request, view=self
+            )
+            data["next"] = paginator.get_next_link()
+        return self.json(ProductInfoSerializer(data).data)
+
+
+class AsyncOrderListView(AsyncAPIView):
+    authentication_required = True
+    filter_backends = OrderViewSet.filter_backends
+    filterset_class = OrderViewSet.filterset_class
+    ordering_fields = OrderViewSet.ordering_fields
+    query_budget = 4
+
+    def get_queryset(self):
+        queryset = Order.objects.all()
+        if not self.user.is_staff:
+            queryset = queryset.filter(user=self.user)
+        return queryset
+
+    async def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.json(await aserialize_orders(queryset))
+
+
+class AsyncOrderDetailView(AsyncOrderListView):
+    async def get(self, request, pk):
+        orders = await aserialize_orders(self.get_queryset().filter(pk=pk))
+        if not orders:
+            raise exceptions.NotFound("No Order matches the given query.")
+        return self.json(orders[0])
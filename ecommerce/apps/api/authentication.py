@@ -0,0 +1,205 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers as jwt_serializers, tokens
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.api.models import User
+
+"""
+   JWT authentication without a User query per request.
+
+   CachedJWTAuthentication verifies the token like simplejwt's backend and
+   then resolves its user through an in-process LRU of JWT_USER_CACHE_SIZE
+   users, each kept for JWT_USER_CACHE_TTL seconds. Saving or deleting a
+   User drops its entry in this process right away; other processes notice
+   within the TTL. Each entry is returned as a copy, so a view changing
+   request.user can't leak into the next request.
+
+   With JWT_STATELESS_USER the user is built from claims of the access token
+   instead (username, is_staff, is_superuser), written when the token is
+   obtained or refreshed. Those are as fresh as the access token's lifetime.
+
+   `revoke_tokens` rejects every token of a user issued before the current
+   second: `iat` is whole seconds, so a token issued earlier within that
+   second still passes, and a login right after it is accepted. The
+   cutoff lives in the "default" cache (use a shared one when running
+   several workers) and is cached with the user, so it applies in this
+   process at once and in the others within the TTL. It's what
+   POST /api/token/revoke/ calls for the current user.
+"""
+
+CLAIMS = ("username", "is_staff", "is_superuser")
+REVOKED_KEY = "jwt-revoked-before:{}"
+
+CachedUser = namedtuple("CachedUser", ["user", "revoked_before", "expires"])
+
+
+class UserCache:
+    """A thread-safe LRU of user id -> CachedUser, sized and aged by settings.
+
+    Ids are keyed as strings, simplejwt writes them to tokens that way.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return entry
+
+    def set(self, user_id, user, revoked_before):
+        user_id = str(user_id)
+        entry = CachedUser(user, revoked_before, time.monotonic() + settings.JWT_USER_CACHE_TTL)
+        with self.lock:
+            self.entries[user_id] = entry
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > settings.JWT_USER_CACHE_SIZE:
+                self.entries.popitem(last=False)
+        return entry
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+users = UserCache()
+
+
+def user_claims(user):
+    return {claim: getattr(user, claim) for claim in CLAIMS}
+
+
+def revoked_before(user_id):
+    """Unix time before which the user's tokens are revoked, 0 if never."""
+    return caches["default"].get(REVOKED_KEY.format(user_id), 0)
+
+
+def revoke_tokens(user_id):
+    # outlives every token issued before now, refresh tokens included
+    timeout = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    caches["default"].set(REVOKED_KEY.format(user_id), int(time.time()), timeout)
+    users.discard(user_id)
+
+
+def invalidate_user(user_id):
+    # and again on commit, a concurrent request may have cached the old row
+    users.discard(user_id)
+    transaction.on_commit(lambda: users.discard(user_id))
+
+
+def check_not_revoked(token, since):
+    if token.get("iat", 0) < since:
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        stateless = settings.JWT_STATELESS_USER and all(
+            claim in validated_token for claim in CLAIMS
+        )
+        entry = users.get(user_id)
+        if entry is None or (entry.user is None and not stateless):
+            user = None if stateless else self.load_user(user_id)
+            entry = users.set(user_id, user, revoked_before(user_id))
+        check_not_revoked(validated_token, entry.revoked_before)
+
+        if stateless:
+            user = User(
+                pk=User._meta.pk.to_python(user_id),
+                is_active=True,
+                **{claim: validated_token[claim] for claim in CLAIMS},
+            )
+            user._state.adding = False
+            user._state.db = "default"
+            return user
+        user = entry.user
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return copy.copy(user)
+
+    def load_user(self, user_id):
+        user = self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class RefreshToken(tokens.RefreshToken):
+    """A refresh token that writes its user's claims into the access tokens it mints."""
+
+    user_claims = {}
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.user_claims = user_claims(user)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access.payload.update(self.user_claims)
+        return access
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    token_class = RefreshToken
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """simplejwt's, rejecting revoked refresh tokens and refreshing the user claims."""
+
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user_id = refresh.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        check_not_revoked(refresh, revoked_before(user_id))
+
+        refresh.user_claims = user_claims(user)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # the blacklist app isn't installed, so there's nothing to blacklist
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
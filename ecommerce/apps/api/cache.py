@@ -0,0 +1,171 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+# The backend is whatever CACHES["api"] points at: a size-bounded LocMemCache
+# by default, or Redis/Memcached in deployments with more than one worker.
+CACHE_ALIAS = "api"
+GENERATION_KEY = "products:generation"
+# stock changes (checkouts) don't bump the generation: each product has a
+# stock version, set from a shared clock, and cached responses remember
+# the versions of the products they show
+STOCK_CLOCK_KEY = "products:stock-clock"
+STOCK_VERSION_KEY = "products:stock:{}"
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _counter(key):
+    cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        # start from the clock so an evicted counter can't reuse old values
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        value = time.time_ns()
+        cache.set(key, value, timeout=None)
+        return value
+
+
+def products_generation():
+    """Current product data version, part of every cached response key.
+
+    Bumping it makes every cached product response unreachable at once, so
+    a write never has to know which list pages or filters it affected.
+    """
+    return _counter(GENERATION_KEY)
+
+
+def invalidate_products():
+    _bump(GENERATION_KEY)
+
+
+def invalidate_products_on_commit():
+    # bump now so this transaction never reads stale entries, and again on
+    # commit in case a concurrent reader cached the old rows in between
+    invalidate_products()
+    transaction.on_commit(invalidate_products)
+
+
+def invalidate_stock(product_ids):
+    """Stale the cached responses showing the stock of these products."""
+    tick = _bump(STOCK_CLOCK_KEY)
+    get_cache().set_many(
+        {STOCK_VERSION_KEY.format(pk): tick for pk in product_ids}, timeout=None
+    )
+
+
+def invalidate_stock_on_commit(product_ids):
+    # both, like invalidate_products_on_commit
+    product_ids = list(product_ids)
+    invalidate_stock(product_ids)
+    transaction.on_commit(lambda: invalidate_stock(product_ids))
+
+
+def stock_versions(data, clock, all_stock):
+    """{cache key: version} of the stock `data` was rendered from.
+
+    `clock` is the stock clock read before rendering; products never seen
+    start there. With `all_stock` (totals over every product) it's the
+    clock itself.
+    """
+    if all_stock:
+        return {STOCK_CLOCK_KEY: clock}
+    rows = data.get("results", [data]) if isinstance(data, dict) else data
+    keys = [
+        STOCK_VERSION_KEY.format(row["id"]) for row in rows if isinstance(row, dict) and "id" in row
+    ]
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in set(keys) - versions.keys():
+        cache.add(key, clock, timeout=None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def response_cache_key(prefix, request, kwargs):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    raw = json.dumps(
+        [request.accepted_renderer.format, sorted(kwargs.items()), params],
+        separators=(",", ":"),
+    )
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"products:{products_generation()}:{prefix}:{digest}"
+
+
+def compute_etag(data):
+    raw = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(",", ":"))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_product_response(prefix, timeout=None, all_stock=False):
+    """Cache a product GET handler's response data and answer If-None-Match.
+
+    Runs after DRF's authentication and permission checks since it wraps the
+    handler itself. Only 200 responses are stored, keyed by the product
+    generation, renderer format, URL kwargs and normalized query params,
+    and used while the stock of the products in them is unchanged (of
+    every product with `all_stock`).
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            cache = get_cache()
+            key = response_cache_key(prefix, request, kwargs)
+            entry = cache.get(key)
+            if entry is not None and cache.get_many(list(entry[2])) != entry[2]:
+                entry = None
+            if entry is None:
+                clock = _counter(STOCK_CLOCK_KEY)
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                etag = compute_etag(response.data)
+                versions = stock_versions(response.data, clock, all_stock)
+                # stock written while rendering may not be in the data, skip
+                # it (None: a backend that doesn't store, like DummyCache)
+                if None not in versions.values() and all(
+                    version <= clock for version in versions.values()
+                ):
+                    cache_timeout = timeout if timeout is not None else cache.default_timeout
+                    cache.set(key, (etag, response.data, versions), cache_timeout)
+            else:
+                etag, data, _ = entry
+                response = Response(data)
+
+            if etag_matches(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,59 @@
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.api.serializers import OrderSerializer
+
+CSV_HEADER = [
+    "order_id",
+    "user",
+    "create_at",
+    "status",
+    "total_price",
+    "product_id",
+    "product_name",
+    "unit_price",
+    "quantity",
+    "item_subtotal",
+]
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_orders_ndjson(orders):
+    encoder = JSONEncoder(separators=(",", ":"))
+    for order in orders:
+        yield encoder.encode(OrderSerializer(order).data) + "\n"
+
+
+def stream_orders_csv(orders):
+    """One CSV row per order line; orders without items get a single row."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        head = [
+            order.order_id,
+            order.user_id,
+            order.create_at.isoformat(),
+            order.status,
+            order.total_price,
+        ]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(head + [""] * 5)
+        for item in items:
+            yield writer.writerow(
+                head
+                + [
+                    item.product_id,
+                    item.product.name,
+                    item.unit_price,
+                    item.quantity,
+                    item.item_subtotal,
+                ]
+            )
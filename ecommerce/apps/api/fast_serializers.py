@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from apps.api.images import image_urls
+from apps.api.models import OrderItem
+
+"""
+   Read-only fast paths for the big list endpoints.
+
+   They read plain rows with .values()/.values_list() instead of model
+   instances and convert each column with a getter compiled once per field,
+   skipping DRF's per-field machinery. The output has to stay identical to
+   ProductSerializer / OrderSerializer, which the parity tests and
+   `manage.py bench_serializers` check.
+"""
+
+PRODUCT_FIELDS = ("id", "name", "description", "price", "stock", "image", "image_variants")
+
+# chunks for `order_id IN (...)`, below sqlite's bound-parameter limit
+IN_CHUNK_SIZE = 900
+
+
+def decimal_to_string(decimal_places):
+    """Same output as DRF's DecimalField with COERCE_DECIMAL_TO_STRING."""
+    exponent = Decimal(1).scaleb(-decimal_places)
+
+    def convert(value):
+        if value is None:
+            return None
+        return "{:f}".format(value.quantize(exponent))
+
+    return convert
+
+
+def decimal_quantized(decimal_places):
+    exponent = Decimal(1).scaleb(-decimal_places)
+
+    def convert(value):
+        if value is None:
+            return None
+        return value.quantize(exponent)
+
+    return convert
+
+
+price_to_string = decimal_to_string(2)
+total_quantized = decimal_quantized(2)
+datetime_to_string = serializers.DateTimeField().to_representation
+
+
+def product_rows(queryset):
+    """Values queryset for `serialize_products`, keeps filters and ordering."""
+    return queryset.values(*PRODUCT_FIELDS)
+
+
+def serialize_products(rows):
+    """ProductSerializer output for rows from `product_rows`, converted in place."""
+    for row in rows:
+        row["price"] = price_to_string(row["price"])
+        row["images"] = image_urls(row.pop("image"), row.pop("image_variants"))
+    return rows
+
+
+ORDER_FIELDS = ("order_id", "user_id", "create_at", "status", "total_price")
+ORDER_ITEM_FIELDS = (
+    "order_id",
+    "product__name",
+    "product__price",
+    "product__description",
+    "unit_price",
+    "quantity",
+)
+
+
+def _order_item_querysets(order_ids):
+    for start in range(0, len(order_ids), IN_CHUNK_SIZE):
+        yield (
+            OrderItem.objects.filter(order_id__in=order_ids[start : start + IN_CHUNK_SIZE])
+            .order_by("pk")
+            .values_list(*ORDER_ITEM_FIELDS)
+        )
+
+
+def _add_item(items, row):
+    order_id, name, price, description, unit_price, quantity = row
+    items.setdefault(order_id, []).append(
+        {
+            "product_name": name,
+            "product_price": price_to_string(price),
+            "product_description": description,
+            "unit_price": price_to_string(unit_price),
+            "quantity": quantity,
+            "item_subtotal": unit_price * quantity,
+        }
+    )
+
+
+def _order_dicts(rows, items):
+    return [
+        {
+            "order_id": str(order_id),
+            "user": user_id,
+            "create_at": datetime_to_string(create_at),
+            "status": status,
+            "items": items.get(order_id, []),
+            "total_price": total_quantized(total_price),
+        }
+        for order_id, user_id, create_at, status, total_price in rows
+    ]
+
+
+def serialize_orders(queryset):
+    """OrderSerializer(many=True) output in two queries (orders, then items)."""
+    rows = list(queryset.prefetch_related(None).values_list(*ORDER_FIELDS))
+    items = {}
+    for item_rows in _order_item_querysets([row[0] for row in rows]):
+        for row in item_rows:
+            _add_item(items, row)
+    return _order_dicts(rows, items)
+
+
+async def aserialize_orders(queryset):
+    """Async twin of `serialize_orders` for the async views."""
+    rows = [
+        row async for row in queryset.prefetch_related(None).values_list(*ORDER_FIELDS)
+    ]
+    items = {}
+    for item_rows in _order_item_querysets([row[0] for row in rows]):
+        async for row in item_rows:
+            _add_item(items, row)
+    return _order_dicts(rows, items)
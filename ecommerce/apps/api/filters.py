@@ -31,4 +31,5 @@ class OrderFilter(django_filters.FilterSet):
                 "exact",
                 "range",
             ],
+            "total_price": ["lt", "gt", "range"],
         }
@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.http.request import RawPostDataException
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.api.models import IdempotencyKey
+
+"""
+   Idempotency-Key support for POST handlers.
+
+   The first request with a key inserts an IdempotencyKey row for (user,
+   key) before it runs, in its own short transaction, so every retry sees
+   it. When the handler returns, its status and JSON body are stored on the
+   row for IDEMPOTENCY_KEY_TTL; a retry with the same key and the same body
+   gets that response back, with `Idempotent-Replayed: true`, and nothing
+   is created twice.
+
+   A duplicate arriving while the first request is still running polls the
+   row for up to IDEMPOTENCY_WAIT seconds and then reuses its response, or
+   gets a 409 to retry later. An in-flight row expires after
+   IDEMPOTENCY_LOCK_TIMEOUT, so a key isn't stuck when its request died.
+   When the handler raises, the row is dropped and the key can be retried.
+
+   `manage.py purge_idempotency_keys` deletes the expired rows.
+"""
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+POLLS = 4
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress, retry later."
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def fingerprint(request):
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    try:
+        body = request.body
+    except RawPostDataException:
+        # a form the CSRF check already read: hash what was parsed from it
+        data = request.data
+        if hasattr(data, "lists"):
+            data = sorted(data.lists())
+        body = json.dumps(data, sort_keys=True, default=str).encode()
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def claim(user, key, digest):
+    """Insert `key` as in flight; returns (row, True), or (the live row, False)."""
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                row = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=digest,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                )
+            return row, True
+        except IntegrityError:
+            row = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if row is None:
+                # not the (user, key) clash, e.g. the user was just deleted
+                raise
+        if row.expires_at > now:
+            return row, False
+        # expired: take it over
+        IdempotencyKey.objects.filter(pk=row.pk, expires_at__lte=now).delete()
+
+
+def wait_for(row):
+    """Poll an in-flight row until it has a response; None when it was dropped.
+
+    POLLS reads with doubling sleeps that add up to IDEMPOTENCY_WAIT, so a
+    waiting duplicate stays within the create's query budget.
+    """
+    delay = settings.IDEMPOTENCY_WAIT / (2**POLLS - 1)
+    for _ in range(POLLS):
+        time.sleep(delay)
+        delay *= 2
+        row = IdempotencyKey.objects.filter(pk=row.pk).first()
+        if row is None or row.status_code is not None:
+            return row
+    raise IdempotencyConflict()
+
+
+def store(row, response):
+    # stored as rendered by DRF's encoder (decimals as numbers and so on),
+    # so the replay renders the same bytes
+    body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+    IdempotencyKey.objects.filter(pk=row.pk).update(
+        status_code=response.status_code,
+        response=body,
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+
+
+def replay(row):
+    return Response(row.response, status=row.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def idempotent(handler):
+    """Make a POST handler of authenticated users honour the Idempotency-Key header.
+
+    Requests without the header run as before.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f"Must be 1 to {MAX_KEY_LENGTH} characters."})
+
+        digest = fingerprint(request)
+        row, created = claim(request.user, key, digest)
+        while not created:
+            if row.fingerprint != digest:
+                raise IdempotencyKeyReused()
+            if row.status_code is not None:
+                return replay(row)
+            row = wait_for(row)
+            if row is None:
+                row, created = claim(request.user, key, digest)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=row.pk).delete()
+            raise
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(pk=row.pk).delete()
+        else:
+            store(row, response)
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000):
+    """Delete expired rows in batches; returns how many."""
+    purged = 0
+    while True:
+        expired = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list(
+                "pk", flat=True
+            )[:batch_size]
+        )
+        if not expired:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=expired).delete()[0]
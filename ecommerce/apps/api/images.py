@@ -0,0 +1,108 @@
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from apps.api.cache import invalidate_products
+from apps.api.models import Product
+from apps.api.tasks import WorkerPool
+
+"""
+   Resized variants of Product.image.
+
+   After a product's image changes, the post_save signal schedules the work
+   once the transaction commits. A thread pool of PRODUCT_IMAGE_WORKERS
+   (Pillow releases the GIL while resizing and encoding) then writes one
+   WebP and one JPEG per PRODUCT_IMAGE_VARIANTS size and records their
+   names in Product.image_variants. With no workers it runs inline.
+
+   Originals and variants are named after a hash of the original's bytes
+   (and the variant size), so a URL never changes content and can be
+   served with a far-future Cache-Control. Until the worker is done the
+   API only lists the original.
+"""
+
+logger = logging.getLogger("apps.api.images")
+
+# PIL format, file extension
+FORMATS = (("WEBP", "webp"), ("JPEG", "jpg"))
+QUALITY = 82
+
+
+pool = WorkerPool("PRODUCT_IMAGE_WORKERS", "product-images")
+
+
+def schedule_variants(product_id, name):
+    if not pool.workers:
+        return update_variants(product_id, name)
+    return pool.submit(_run, product_id, name)
+
+
+def _run(product_id, name):
+    try:
+        return update_variants(product_id, name)
+    except Exception:
+        logger.exception("Couldn't build image variants of product %s from %s", product_id, name)
+    finally:
+        close_old_connections()
+
+
+def update_variants(product_id, name):
+    """Build the variants of image `name` and store them on the product.
+
+    Skipped when the product's image changed again in the meantime, the
+    newer upload has its own job.
+    """
+    variants = build_variants(name) if name else {}
+    if Product.objects.filter(pk=product_id, image=name).update(image_variants=variants):
+        invalidate_products()
+    return variants
+
+
+def build_variants(name):
+    # Pillow is only needed here; the serializers import this module on every
+    # worker's first request, most of which never resize anything
+    from PIL import Image, ImageOps
+
+    with default_storage.open(name) as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    original = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    variants = {"source": name}
+    for variant, size in settings.PRODUCT_IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[variant] = {
+            extension: _save(image, f"products/variants/{digest}-{size}.{extension}", image_format)
+            for image_format, extension in FORMATS
+        }
+    return variants
+
+
+def _save(image, name, image_format):
+    # same name, same bytes: an earlier upload of this image already wrote it
+    if default_storage.exists(name):
+        return name
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, image_format, quality=QUALITY)
+    return default_storage.save(name, ContentFile(output.getvalue()))
+
+
+def image_urls(name, variants):
+    """The `images` field of the product serializers."""
+    if not name:
+        return None
+    urls = {"original": default_storage.url(name)}
+    if variants.get("source") == name:
+        for variant, files in variants.items():
+            if variant != "source":
+                urls[variant] = {
+                    extension: default_storage.url(file) for extension, file in files.items()
+                }
+    return urls
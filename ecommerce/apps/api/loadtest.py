@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+import importlib.util
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+"""
+   Small asyncio load generator shared by the bench_* commands.
+
+   It speaks just enough HTTP/1.1 over keep-alive asyncio streams to replay
+   a list of requests with N concurrent connections, so benchmarking doesn't
+   need an HTTP client dependency. The server side is a uvicorn subprocess
+   serving ecommerce.asgi, started with `uvicorn_server()`.
+"""
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened after errors or `close`."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b""):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in response_headers:
+            content = await self.reader.readexactly(int(response_headers["content-length"]))
+        elif response_headers.get("transfer-encoding") == "chunked":
+            content = await self.read_chunked()
+        else:
+            content = await self.reader.read()
+            self.close()
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status, response_headers, content
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+async def run_load(host, port, scenario, concurrency=10, total=1000):
+    """Replay `scenario` round-robin over `concurrency` connections.
+
+    `scenario` is a list of (name, method, path, headers, body) tuples;
+    returns `summarize()` stats per name. Non-2xx/3xx responses and
+    connection errors count as errors, only successes feed the latencies.
+    """
+    counter = itertools.count()
+    latencies = defaultdict(list)
+    errors = Counter()
+
+    async def worker():
+        connection = Connection(host, port)
+        while (index := next(counter)) < total:
+            name, method, path, headers, body = scenario[index % len(scenario)]
+            started = time.perf_counter()
+            try:
+                status, _, _ = await connection.request(method, path, headers, body)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                errors[name] += 1
+                connection.close()
+                continue
+            if status >= 400:
+                errors[name] += 1
+            else:
+                latencies[name].append((time.perf_counter() - started) * 1000)
+        connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    names = dict.fromkeys(name for name, *_ in scenario)
+    return {name: summarize(latencies[name], errors[name], elapsed) for name in names}
+
+
+def uvicorn_available():
+    return importlib.util.find_spec("uvicorn") is not None
+
+
+def sync_only_middleware():
+    """MIDDLEWARE entries that make ASGI requests hop into a thread."""
+    return [
+        path
+        for path in settings.MIDDLEWARE
+        if not getattr(import_string(path), "async_capable", False)
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def uvicorn_server(port, workers=1, timeout=30):
+    """Serve ecommerce.asgi with uvicorn on 127.0.0.1:`port` for the block."""
+    # a file rather than a pipe, nobody drains it while the load runs
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "ecommerce.asgi:application",
+            "--host=127.0.0.1",
+            f"--port={port}",
+            f"--workers={workers}",
+            "--log-level=warning",
+            "--no-access-log",
+        ],
+        cwd=settings.BASE_DIR,
+        env=os.environ.copy(),
+        stderr=log,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"uvicorn exited: {log.read().decode()}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn did not start within {timeout}s")
+                time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
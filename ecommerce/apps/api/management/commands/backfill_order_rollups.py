@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from apps.api.analytics import backfill_order_rollups
+
+
+def timestamp(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"Not a datetime: {value}")
+    return make_aware(parsed) if is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = "Recomputes the hourly order rollups behind /orders/analytics/ from the orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=timestamp, help="First hour to rebuild (default: all)")
+        parser.add_argument("--end", type=timestamp, help="Hour to stop before (default: all)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = backfill_order_rollups(
+            start=options["start"], end=options["end"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {rows} rollup rows in {time.perf_counter() - started:.1f}s"
+            )
+        )
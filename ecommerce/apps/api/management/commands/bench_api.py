@@ -0,0 +1,250 @@
+import asyncio
+import json
+import platform
+import random
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import lorem_ipsum
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.api.cache import invalidate_products
+from apps.api.loadtest import free_port, run_load, uvicorn_available, uvicorn_server
+from apps.api.models import Order, OrderItem, Product, User
+from apps.api.seeding import BENCH_USER_PREFIX, seed_dataset
+
+# endpoint -> weight in each mix; the requests mirror the ones in api.http
+MIXES = {
+    "browse": {
+        "product search": 3,
+        "product ordering": 3,
+        "product info": 2,
+        "product detail": 2,
+    },
+    "checkout": {"order create": 1, "user orders": 2},
+    "mixed": {
+        "product search": 3,
+        "product ordering": 3,
+        "product info": 1,
+        "product detail": 2,
+        "order create": 1,
+        "user orders": 2,
+    },
+}
+
+# distinct requests generated per mix, replayed round-robin by the load
+SCENARIO_SIZE = 1000
+TOKEN_USERS = 50
+
+# silk's own bookkeeping (and its EXPLAINs) and transaction control
+NOT_COUNTED = ("EXPLAIN", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class Command(BaseCommand):
+    help = "Seeds a synthetic dataset and load-tests a mix of API endpoints under uvicorn"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--orders", type=int, default=10_000)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+        parser.add_argument("--requests", type=int, default=5000, help="Total across the mix")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+        parser.add_argument(
+            "--port",
+            type=int,
+            help="Load-test a server already listening on 127.0.0.1:PORT instead "
+            "of starting uvicorn",
+        )
+        parser.add_argument(
+            "--output",
+            default="bench-api.json",
+            help="Where to write the JSON results ('-' to skip)",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Earlier --output file to print throughput and p99 changes against",
+        )
+
+    def handle(self, *args, **options):
+        if options["port"] is None and not uvicorn_available():
+            raise CommandError("uvicorn is not installed: pip install uvicorn")
+
+        created = seed_dataset(
+            products=options["products"],
+            users=options["users"],
+            orders=options["orders"],
+            items_per_order=options["items_per_order"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in created.items())
+        )
+
+        scenario = self.build_scenario(options["mix"], random.Random(options["seed"]))
+        queries = self.count_queries(scenario)
+        if options["port"] is not None:
+            results = self.run(options["port"], scenario, options)
+        else:
+            port = free_port()
+            with uvicorn_server(port, workers=options["workers"]):
+                results = self.run(port, scenario, options)
+        for name, stats in results.items():
+            stats["queries"] = queries[name]
+
+        baseline = self.load_baseline(options["baseline"])
+        self.report(results, baseline)
+        if options["output"] != "-":
+            with open(options["output"], "w") as output:
+                json.dump(self.document(results, options), output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def build_scenario(self, mix, rng):
+        users = list(
+            User.objects.filter(username__startswith=BENCH_USER_PREFIX)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:TOKEN_USERS]
+        )
+        product_ids = list(Product.objects.filter(stock__gt=0).values_list("pk", flat=True))
+        if not users or not product_ids:
+            raise CommandError("Need at least one bench user and one in-stock product")
+        tokens = {
+            user: {"Authorization": f"Bearer {AccessToken.for_user(User(pk=user))}"}
+            for user in users
+        }
+
+        def request(name):
+            user = rng.choice(users)
+            if name == "product search":
+                path = f"/products/?search={rng.choice(lorem_ipsum.WORDS)}&ordering=-price"
+                return "GET", path, {}, b""
+            if name == "product ordering":
+                ordering = rng.choice(["price", "-price", "name", "-name"])
+                path = f"/products/?ordering={ordering}&page={rng.randint(1, 5)}"
+                return "GET", path, {}, b""
+            if name == "product info":
+                return "GET", "/products/info/", {}, b""
+            if name == "product detail":
+                return "GET", f"/products/{rng.choice(product_ids)}/", {}, b""
+            if name == "order create":
+                items = [
+                    {"product": product, "quantity": rng.randint(1, 3)}
+                    for product in rng.sample(product_ids, min(2, len(product_ids)))
+                ]
+                body = json.dumps({"user": user, "status": "Pending", "items": items})
+                headers = {**tokens[user], "Content-Type": "application/json"}
+                return "POST", "/orders/", headers, body.encode()
+            return "GET", "/orders/user-orders/", tokens[user], b""
+
+        names = list(MIXES[mix])
+        weights = list(MIXES[mix].values())
+        return [
+            (name, *request(name))
+            for name in rng.choices(names, weights=weights, k=SCENARIO_SIZE)
+        ]
+
+    def count_queries(self, scenario):
+        """Queries per endpoint on a cold response cache, rolled back afterwards."""
+        client = Client()
+        counts = {}
+        for name, method, path, headers, body in scenario:
+            if name in counts:
+                continue
+            invalidate_products()
+            with override_settings(ALLOWED_HOSTS=["testserver"]), transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    client.generic(
+                        method, path, body, content_type="application/json", headers=headers
+                    )
+                transaction.set_rollback(True)
+            counts[name] = sum(
+                not (query["sql"].startswith(NOT_COUNTED) or "silk_" in query["sql"])
+                for query in captured.captured_queries
+            )
+        return counts
+
+    def run(self, port, scenario, options):
+        return asyncio.run(
+            run_load(
+                "127.0.0.1",
+                port,
+                scenario,
+                concurrency=options["concurrency"],
+                total=options["requests"],
+            )
+        )
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as baseline:
+                return json.load(baseline)["results"]
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Can't read baseline {path}: {exc}")
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f"{'endpoint':<18}{'reqs':>7}{'err':>5}{'rps':>8}{'p50 ms':>9}"
+            f"{'p90 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for name, stats in results.items():
+            line = (
+                f"{name:<18}{stats['requests']:>7}{stats['errors']:>5}{stats['rps']:>8.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['queries']:>9}"
+            )
+            before = baseline.get(name)
+            if before and before["rps"] and before["p99_ms"]:
+                rps = (stats["rps"] / before["rps"] - 1) * 100
+                p99 = (stats["p99_ms"] / before["p99_ms"] - 1) * 100
+                line += f"   rps {rps:+.0f}%  p99 {p99:+.0f}%"
+                if before["queries"] != stats["queries"]:
+                    line += f"  queries {before['queries']} -> {stats['queries']}"
+            self.stdout.write(line)
+
+    def document(self, results, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "options": {
+                key: options[key]
+                for key in (
+                    "mix",
+                    "requests",
+                    "concurrency",
+                    "workers",
+                    "seed",
+                    "items_per_order",
+                )
+            },
+            "dataset": {
+                "products": Product.objects.count(),
+                "users": User.objects.count(),
+                "orders": Order.objects.count(),
+                "order_items": OrderItem.objects.count(),
+            },
+            "results": results,
+        }
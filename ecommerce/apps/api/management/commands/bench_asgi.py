@@ -0,0 +1,126 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.api.loadtest import (
+    free_port,
+    run_load,
+    sync_only_middleware,
+    uvicorn_available,
+    uvicorn_server,
+)
+from apps.api.models import Order, Product, User
+
+# (label, sync path, async path); {product_id}/{order_id} filled from the db
+ENDPOINTS = [
+    ("product list", "/products/?ordering=-price", "/async/products/?ordering=-price"),
+    (
+        "product keyset",
+        "/products/?pagination=keyset&size=5",
+        "/async/products/?pagination=keyset&size=5",
+    ),
+    ("product detail", "/products/{product_id}/", "/async/products/{product_id}/"),
+    ("product info", "/products/info/", "/async/products/info/"),
+    ("order list", "/orders/", "/async/orders/"),
+    ("order detail", "/orders/{order_id}/", "/async/orders/{order_id}/"),
+]
+
+
+class Command(BaseCommand):
+    help = "Load-tests the sync DRF views against their async twins under uvicorn"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Per endpoint and mode")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+        parser.add_argument(
+            "--user",
+            help="Username the order endpoints authenticate as (defaults to the "
+            "first superuser; order endpoints are skipped without one)",
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            help="Benchmark a server already listening on 127.0.0.1:PORT instead "
+            "of starting uvicorn",
+        )
+
+    def handle(self, *args, **options):
+        if options["port"] is None and not uvicorn_available():
+            raise CommandError("uvicorn is not installed: pip install uvicorn")
+
+        for path in sync_only_middleware():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{path} is sync-only, so every ASGI request (async views "
+                    "included) is handed to a thread while it's enabled"
+                )
+            )
+        if "dummy" not in settings.CACHES.get("api", {}).get("BACKEND", "dummy"):
+            self.stdout.write(
+                self.style.WARNING(
+                    "Sync product endpoints answer from the 'api' response cache, "
+                    "async ones always query; use --settings with a dummy 'api' "
+                    "cache to compare the views alone"
+                )
+            )
+
+        scenarios = self.scenarios(options["user"])
+        if options["port"] is not None:
+            results = self.run(options["port"], scenarios, options)
+        else:
+            port = free_port()
+            with uvicorn_server(port, workers=options["workers"]):
+                results = self.run(port, scenarios, options)
+
+        self.stdout.write(
+            f"{'endpoint':<16}{'sync rps':>10}{'async rps':>11}"
+            f"{'sync p99':>11}{'async p99':>12}{'errors':>8}"
+        )
+        for label, (sync, async_) in results.items():
+            self.stdout.write(
+                f"{label:<16}{sync['rps']:>10.0f}{async_['rps']:>11.0f}"
+                f"{sync['p99_ms']:>9.1f}ms{async_['p99_ms']:>10.1f}ms"
+                f"{sync['errors'] + async_['errors']:>8}"
+            )
+
+    def scenarios(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"No user named {username!r}")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        ids = {
+            "product_id": Product.objects.values_list("pk", flat=True).first(),
+            "order_id": Order.objects.values_list("pk", flat=True).first(),
+        }
+
+        for label, sync_path, async_path in ENDPOINTS:
+            if label.startswith("order") and user is None:
+                self.stdout.write(self.style.WARNING(f"Skipping {label}: no user"))
+                continue
+            if any(f"{{{name}}}" in sync_path and value is None for name, value in ids.items()):
+                self.stdout.write(self.style.WARNING(f"Skipping {label}: no rows to fetch"))
+                continue
+            yield label, sync_path.format(**ids), async_path.format(**ids), headers
+
+    def run(self, port, scenarios, options):
+        results = {}
+        for label, sync_path, async_path, headers in scenarios:
+            results[label] = [
+                asyncio.run(
+                    run_load(
+                        "127.0.0.1",
+                        port,
+                        [(label, "GET", path, headers, b"")],
+                        concurrency=options["concurrency"],
+                        total=options["requests"],
+                    )
+                )[label]
+                for path in (sync_path, async_path)
+            ]
+        return results
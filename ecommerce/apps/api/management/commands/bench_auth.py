@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.api.authentication import CachedJWTAuthentication, RefreshToken, users
+from apps.api.models import User
+
+
+class Command(BaseCommand):
+    help = "Times JWT authentication per request: simplejwt's, cached, and stateless"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username="bench-auth", defaults={"email": ""})
+        token = RefreshToken.for_user(user).access_token
+        request = RequestFactory().get("/orders/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        cases = [
+            ("simplejwt", JWTAuthentication(), False),
+            ("cached", CachedJWTAuthentication(), False),
+            ("stateless", CachedJWTAuthentication(), True),
+        ]
+        self.stdout.write(f"{'backend':<12}{'per request':>13}{'queries':>10}{'speedup':>9}")
+        baseline = None
+        for name, backend, stateless in cases:
+            users.clear()
+            with override_settings(JWT_STATELESS_USER=stateless):
+                authenticated, _ = backend.authenticate(request)
+                if authenticated.pk != user.pk:
+                    raise CommandError(f"{name} authenticated the wrong user")
+                with CaptureQueriesContext(connection) as queries:
+                    per_request = self.time(backend, request, options)
+            baseline = baseline or per_request
+            self.stdout.write(
+                f"{name:<12}{per_request:>11.1f}us"
+                f"{len(queries) / (options['requests'] * options['repeat']):>10.2f}"
+                f"{baseline / per_request:>8.1f}x"
+            )
+        users.clear()
+
+    def time(self, backend, request, options):
+        """Median microseconds per authenticate() over `repeat` runs."""
+        samples = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                backend.authenticate(request)
+            samples.append((time.perf_counter() - started) * 1e6 / options["requests"])
+        return statistics.median(samples)
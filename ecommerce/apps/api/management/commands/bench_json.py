@@ -0,0 +1,105 @@
+import gc
+import io
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.parsers import FastJSONParser
+from apps.api.renderers import FastJSONRenderer, fast_json_available
+
+
+class Command(BaseCommand):
+    help = "Checks byte parity and times the orjson renderer and parser against DRF's"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=20000)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not fast_json_available():
+            self.stdout.write(
+                self.style.WARNING("orjson isn't installed, both sides run DRF's code")
+            )
+        data = self.order_list(options)
+        slow, fast = JSONRenderer(), FastJSONRenderer()
+        body = slow.render(data)
+        if fast.render(data) != body:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer's")
+        if FastJSONParser().parse(io.BytesIO(body)) != JSONParser().parse(io.BytesIO(body)):
+            raise CommandError("FastJSONParser result differs from JSONParser's")
+
+        megabytes = len(body) / 1e6
+        cases = [
+            ("render", lambda: slow.render(data), lambda: fast.render(data)),
+            (
+                "parse",
+                lambda: JSONParser().parse(io.BytesIO(body)),
+                lambda: FastJSONParser().parse(io.BytesIO(body)),
+            ),
+        ]
+        self.stdout.write(f"{options['orders']} orders, {megabytes:.1f} MB of JSON")
+        self.stdout.write(
+            f"{'':<8}{'drf':>10}{'fast':>10}{'drf MB/s':>10}{'fast MB/s':>11}{'speedup':>9}"
+        )
+        for name, drf, fast_path in cases:
+            drf_ms = self.time(drf, options["repeat"])
+            fast_ms = self.time(fast_path, options["repeat"])
+            self.stdout.write(
+                f"{name:<8}{drf_ms:>8.1f}ms{fast_ms:>8.1f}ms"
+                f"{megabytes / drf_ms * 1000:>10.0f}{megabytes / fast_ms * 1000:>11.0f}"
+                f"{drf_ms / fast_ms:>8.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Output is byte-identical"))
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            # a full collection walks the whole payload, start each run clean
+            gc.collect()
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def order_list(self, options):
+        """Order dicts shaped like /orders/, with raw UUIDs, datetimes and Decimals."""
+        rng = random.Random(options["seed"])
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        orders = []
+        for index in range(options["orders"]):
+            items = []
+            for _ in range(options["items_per_order"]):
+                price = Decimal(rng.randint(100, 99999)) / 100
+                quantity = rng.randint(1, 5)
+                items.append(
+                    {
+                        "product": {
+                            "id": rng.randint(1, 10**6),
+                            "name": f"Product {rng.randint(1, 10**6)} – édition",
+                            "price": price,
+                        },
+                        "quantity": quantity,
+                        "item_subtotal": price * quantity,
+                    }
+                )
+            orders.append(
+                {
+                    "order_id": uuid.UUID(int=rng.getrandbits(128), version=4),
+                    "user": rng.randint(1, 10**4),
+                    "create_at": start
+                    + timedelta(seconds=index * 37, microseconds=rng.randint(0, 10**6 - 1)),
+                    "status": rng.choice(["Pending", "Confirmed", "Cancelled"]),
+                    "items": items,
+                    "total_price": sum((item["item_subtotal"] for item in items), Decimal("0.00")),
+                }
+            )
+        return orders
@@ -0,0 +1,95 @@
+import random
+import statistics
+import string
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import lorem_ipsum
+
+from apps.api.models import Product
+from apps.api.search import full_text_search, search_index_available
+
+
+class Command(BaseCommand):
+    help = "Compares full-text search latency against the icontains SearchFilter"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=1_000_000,
+            help="Seed synthetic products until the catalog has this many rows",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "terms", nargs="*", default=["dolor", "dolor sit", "abc", "nomatch"]
+        )
+
+    def handle(self, *args, **options):
+        self.seed_products(options["products"], options["seed"])
+        if not search_index_available(Product.objects.db):
+            self.stderr.write("No full-text index on this database, nothing to compare")
+            return
+
+        # both sides do what a paginated list request does: COUNT + one page
+        page_size = options["page_size"]
+        self.stdout.write(f"{'query':<14}{'icontains ms':>14}{'fts ms':>10}{'speedup':>10}")
+        for term in options["terms"]:
+            words = term.split()
+
+            def icontains():
+                queryset = Product.objects.all()
+                for word in words:
+                    queryset = queryset.filter(
+                        Q(name__icontains=word) | Q(description__icontains=word)
+                    )
+                return queryset.count(), list(queryset.order_by("pk")[:page_size])
+
+            def fts():
+                queryset = full_text_search(Product.objects.all(), words)
+                return queryset.count(), list(queryset[:page_size])
+
+            baseline = self.time(icontains, options["repeat"])
+            indexed = self.time(fts, options["repeat"])
+            self.stdout.write(
+                f"{term:<14}{baseline:>14.2f}{indexed:>10.2f}{baseline / indexed:>9.1f}x"
+            )
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def seed_products(self, total, seed):
+        missing = total - Product.objects.count()
+        if missing <= 0:
+            return
+        rng = random.Random(seed)
+        # lorem words are very common; the synthetic ones give a long tail of
+        # rare terms like real product names have
+        vocabulary = list(lorem_ipsum.WORDS) + [
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(20_000)
+        ]
+        self.stdout.write(f"Seeding {missing} products...")
+        batch_size = 5000
+        for start in range(0, missing, batch_size):
+            batch = [
+                Product(
+                    name=" ".join(rng.sample(vocabulary, 3)).title(),
+                    description=" ".join(rng.choices(vocabulary, k=30)),
+                    price=Decimal(rng.randint(100, 100_000)) / 100,
+                    stock=rng.randint(0, 50),
+                )
+                for _ in range(min(batch_size, missing - start))
+            ]
+            with transaction.atomic():
+                Product.objects.bulk_create(batch)
@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.fast_serializers import product_rows, serialize_orders, serialize_products
+from apps.api.models import Order, OrderItem, Product, User
+from apps.api.serializers import OrderSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Checks output parity and times the fast list serializers against DRF's"
+
+    def add_arguments(self, parser):
+        # the DRF path prefetches with a single IN (...) per level, which
+        # sqlite rejects past ~1000 ids; the fast path chunks its lookups
+        parser.add_argument("--orders", type=int, default=300)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.seed(options)
+        renderer = JSONRenderer()
+        orders = Order.objects.prefetch_related("items__product").order_by("create_at", "pk")
+        products = Product.objects.order_by("pk")
+
+        cases = [
+            (
+                "orders",
+                lambda: OrderSerializer(orders, many=True).data,
+                lambda: serialize_orders(orders),
+            ),
+            (
+                "products",
+                lambda: ProductSerializer(products, many=True).data,
+                lambda: serialize_products(list(product_rows(products))),
+            ),
+        ]
+        # "build" is queries + python dicts, "total" adds JSONRenderer on top
+        self.stdout.write(
+            f"{'endpoint':<10}{'drf build':>11}{'fast build':>12}{'speedup':>9}"
+            f"{'drf total':>11}{'fast total':>12}{'speedup':>9}"
+        )
+        for name, slow, fast in cases:
+            if renderer.render(slow()) != renderer.render(fast()):
+                raise CommandError(f"{name}: fast serializer output differs from DRF's")
+            slow_build = self.time(slow, options["repeat"])
+            fast_build = self.time(fast, options["repeat"])
+            slow_total = self.time(lambda: renderer.render(slow()), options["repeat"])
+            fast_total = self.time(lambda: renderer.render(fast()), options["repeat"])
+            self.stdout.write(
+                f"{name:<10}{slow_build:>9.1f}ms{fast_build:>10.1f}ms"
+                f"{slow_build / fast_build:>8.1f}x"
+                f"{slow_total:>9.1f}ms{fast_total:>10.1f}ms"
+                f"{slow_total / fast_total:>8.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Output is byte-identical"))
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        missing = options["products"] - Product.objects.count()
+        if missing > 0:
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f"Bench product {index}",
+                        description="Benchmark product",
+                        price=Decimal(rng.randint(100, 100_000)) / 100,
+                        stock=rng.randint(0, 50),
+                    )
+                    for index in range(missing)
+                ],
+                batch_size=1000,
+            )
+
+        missing = options["orders"] - Order.objects.count()
+        if missing <= 0:
+            return
+        user, _ = User.objects.get_or_create(username="bench")
+        product_prices = list(Product.objects.values_list("pk", "price"))
+        orders, items = [], []
+        for _ in range(missing):
+            order = Order(user=user, total_price=Decimal("0.00"))
+            for product_id, price in rng.sample(product_prices, options["items_per_order"]):
+                quantity = rng.randint(1, 5)
+                items.append(
+                    OrderItem(
+                        order=order, product_id=product_id, unit_price=price, quantity=quantity
+                    )
+                )
+                order.total_price += price * quantity
+            orders.append(order)
+        with transaction.atomic():
+            Order.objects.bulk_create(orders, batch_size=1000)
+            OrderItem.objects.bulk_create(items, batch_size=1000)
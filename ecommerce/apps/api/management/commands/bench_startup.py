@@ -0,0 +1,89 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# run in a fresh interpreter: build the WSGI app like a worker does, then
+# serve one request through it
+FIRST_REQUEST = """
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+from io import BytesIO
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": sys.argv[1], "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+    "wsgi.input": BytesIO(), "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+}
+statuses = []
+body = b"".join(application(environ, lambda status, headers: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({
+    "setup": (ready - started) * 1000, "request": (done - ready) * 1000,
+    "status": statuses[0], "modules": len(sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Times worker cold starts (manage.py check, setup and first request) per settings profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            default=["ecommerce.settings", "ecommerce.settings_production"],
+        )
+        parser.add_argument("--path", default="/products/", help="The first request")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':<32}{'check':>9}{'setup':>9}{'request':>9}{'total':>9}{'modules':>9}"
+        )
+        for profile in options["profiles"]:
+            env = {
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": profile,
+                "DJANGO_SECRET_KEY": os.environ.get("DJANGO_SECRET_KEY", "bench-startup"),
+                "DJANGO_ALLOWED_HOSTS": "localhost",
+            }
+            checks, runs = [], []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                self.run([sys.executable, "manage.py", "check"], env)
+                checks.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                output = self.run([sys.executable, "-c", FIRST_REQUEST, options["path"]], env)
+                run = json.loads(output.splitlines()[-1])
+                run["total"] = (time.perf_counter() - started) * 1000
+                runs.append(run)
+
+            if not runs[0]["status"].startswith("200"):
+                self.stderr.write(
+                    self.style.WARNING(
+                        f"{profile}: {options['path']} answered {runs[0]['status']} (migrated?)"
+                    )
+                )
+            median = {key: statistics.median(run[key] for run in runs) for key in ("setup", "request", "total")}
+            self.stdout.write(
+                f"{profile:<32}{statistics.median(checks):>7.0f}ms"
+                f"{median['setup']:>7.0f}ms{median['request']:>7.0f}ms{median['total']:>7.0f}ms"
+                f"{runs[0]['modules']:>9}"
+            )
+        self.stdout.write("total: interpreter start to first response, as a new worker sees it")
+
+    def run(self, command, env):
+        result = subprocess.run(
+            command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(f"{' '.join(command[:3])} failed:\n{result.stderr}")
+        return result.stdout
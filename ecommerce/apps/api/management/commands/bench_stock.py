@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from apps.api.models import Product
+from apps.api.stock import InsufficientStock, reserve_stock
+
+
+class Command(BaseCommand):
+    help = "Hammers one product's stock from many threads and checks for oversells"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--attempts", type=int, default=2000)
+        parser.add_argument("--stock", type=int, default=1000)
+        parser.add_argument("--quantity", type=int, default=1)
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="DATABASES alias to run against, e.g. a local Postgres entry",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        quantity = options["quantity"]
+        product = Product.objects.using(using).create(
+            name="bench-stock",
+            description="",
+            price=Decimal("1.00"),
+            stock=options["stock"],
+        )
+        counts = {"reserved": 0, "sold_out": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def attempt(_):
+            try:
+                reserve_stock([(product.pk, quantity)], using=using)
+                outcome = "reserved"
+            except InsufficientStock:
+                outcome = "sold_out"
+            except OperationalError:
+                # sqlite raises "database is locked" once its busy timeout runs out
+                outcome = "errors"
+            finally:
+                connections[using].close()
+            with lock:
+                counts[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            list(pool.map(attempt, range(options["attempts"])))
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db(using=using)
+        expected = options["stock"] - counts["reserved"] * quantity
+        Product.objects.using(using).filter(pk=product.pk).delete()
+
+        vendor = connections[using].vendor
+        self.stdout.write(
+            f"{vendor}: {options['attempts']} attempts on {options['threads']} threads "
+            f"in {elapsed:.2f}s ({options['attempts'] / elapsed:.0f} reservations/s)"
+        )
+        self.stdout.write(
+            f"reserved={counts['reserved']} sold_out={counts['sold_out']} "
+            f"errors={counts['errors']} final_stock={product.stock}"
+        )
+        if product.stock != expected or product.stock < 0:
+            self.stderr.write(self.style.ERROR(f"Oversold: expected stock {expected}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell"))
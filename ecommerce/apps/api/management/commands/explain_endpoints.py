@@ -0,0 +1,132 @@
+import inspect
+import re
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.api.models import Order, Product, User
+
+# sqlite: "SCAN api_product" without "USING ... INDEX"; postgres: "Seq Scan on"
+SEQ_SCAN = re.compile(r"^SCAN (?!.*USING (COVERING )?INDEX)|Seq Scan on")
+
+NO_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "api": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+
+
+class Command(BaseCommand):
+    help = "EXPLAINs the SQL behind every GET endpoint and flags sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Username to authenticate as (defaults to the first superuser)",
+        )
+        parser.add_argument(
+            "--query",
+            action="append",
+            default=[],
+            metavar="URL",
+            help="Extra URL to explain, e.g. '/products/?price__gt=10&ordering=-price'",
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error when any query does a sequential scan",
+        )
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+
+        flagged = 0
+        for url in list(self.endpoint_urls()) + options["query"]:
+            flagged += self.explain_url(url, user)
+
+        if flagged:
+            message = f"{flagged} quer{'y' if flagged == 1 else 'ies'} with sequential scans"
+            if options["fail_on_seq_scan"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans"))
+
+    def endpoint_urls(self):
+        """One concrete URL per registered API route, using existing rows for ids."""
+        sample_kwargs = {
+            "product_id": Product.objects.values_list("pk", flat=True).first(),
+            "pk": Order.objects.values_list("pk", flat=True).first(),
+        }
+        for pattern in self.api_patterns():
+            route = pattern.pattern
+            regex = route.regex
+            if "format" in regex.groupindex or regex.pattern in ("^$", "^\\Z"):
+                continue
+            actions = getattr(pattern.callback, "actions", None)
+            if actions is not None and "get" not in actions:
+                continue
+            if any(sample_kwargs.get(name) is None for name in regex.groupindex):
+                continue
+            url = str(route)
+            for name in regex.groupindex:
+                url = re.sub(
+                    rf"<(\w+:)?{name}>|\(\?P<{name}>[^)]*\)", str(sample_kwargs[name]), url
+                )
+            yield "/" + url.lstrip("^").rstrip("$").replace("\\Z", "")
+
+    def api_patterns(self):
+        for pattern in get_resolver().url_patterns:
+            if isinstance(pattern, URLResolver):
+                if getattr(pattern.urlconf_module, "__name__", "") == "apps.api.urls":
+                    yield from pattern.url_patterns
+
+    def explain_url(self, url, user):
+        path, _, query = url.partition("?")
+        match = get_resolver().resolve(path)
+        request = APIRequestFactory().get(f"{path}?{query}" if query else path)
+        if user is not None:
+            force_authenticate(request, user=user)
+
+        with override_settings(CACHES=NO_CACHE, ALLOWED_HOSTS=["testserver"]):
+            with CaptureQueriesContext(connection) as captured:
+                response = match.func(request, *match.args, **match.kwargs)
+                if inspect.isawaitable(response):
+                    # async views; their ORM calls hop back onto this thread
+                    response = async_to_sync(self.await_response)(response)
+                if getattr(response, "streaming", False):
+                    # streaming exports only query while being consumed
+                    for _ in response.streaming_content:
+                        pass
+                elif hasattr(response, "render"):
+                    response.render()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"GET {url} -> {response.status_code}"))
+        flagged = 0
+        for query in captured.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or "silk_" in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(connection.ops.explain_query_prefix() + " " + sql)
+                # the plan text is the last column on both sqlite and postgres
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            scans = [line for line in plan if SEQ_SCAN.search(line.strip())]
+            flagged += bool(scans)
+            self.stdout.write(f"  {sql[:120]}{'...' if len(sql) > 120 else ''}")
+            for line in plan:
+                self.stdout.write(
+                    self.style.WARNING(f"    {line}") if line in scans else f"    {line}"
+                )
+        return flagged
+
+    async def await_response(self, response):
+        return await response
@@ -3,18 +3,39 @@ from decimal import Decimal
 
 from django.core.management.base import BaseCommand
 from django.utils import lorem_ipsum
+from apps.api.cache import invalidate_products
 from apps.api.models import User, Product, Order, OrderItem
+from apps.api.seeding import seed_dataset
 
 
 class Command(BaseCommand):
     help = "Creates application data"
 
+    def add_arguments(self, parser):
+        # any of the sizes switches from the demo data to the bulk generator
+        parser.add_argument("--products", type=int, default=0)
+        parser.add_argument("--users", type=int, default=0)
+        parser.add_argument("--orders", type=int, default=0)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes inserting batches in parallel (sqlite always uses one)",
+        )
+
     def handle(self, *args, **kwargs):
         # get or create superuser
         user = User.objects.filter(username="admin").first()
         if not user:
             user = User.objects.create_superuser(username="admin", password="test")
 
+        if kwargs["products"] or kwargs["users"] or kwargs["orders"]:
+            self.generate(kwargs)
+            return
+
         # create products - name, desc, price, stock, image
         products = [
             Product(
@@ -57,6 +78,8 @@ class Command(BaseCommand):
 
         # create products & re-fetch from DB
         Product.objects.bulk_create(products)
+        # bulk_create skips the post_save signal, drop cached product pages here
+        invalidate_products()
         products = Product.objects.all()
 
         # create some dummy orders tied to the superuser
@@ -67,3 +90,27 @@ class Command(BaseCommand):
                 OrderItem.objects.create(
                     order=order, product=product, quantity=random.randint(1, 3)
                 )
+
+    def generate(self, options):
+        def progress(table, done, total, rows, seconds):
+            self.stdout.write(
+                f"\r{table}: {done}/{total} ({rows / seconds:,.0f} rows/s)",
+                ending="\n" if done == total else "",
+            )
+            self.stdout.flush()
+
+        created = seed_dataset(
+            products=options["products"],
+            users=options["users"],
+            orders=options["orders"],
+            items_per_order=options["items_per_order"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            progress=progress,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Created " + ", ".join(f"{count} {table}" for table, count in created.items())
+            )
+        )
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.api.sales import rebuild_product_sales
+
+
+class Command(BaseCommand):
+    help = "Recomputes the product sales table from the confirmed orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_product_sales(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt sales of {rows} products in {time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.api.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = "Runs queued background tasks, polling the task table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when no task is due instead of polling"
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        threads = options["threads"]
+        self.stdout.write(f"Running tasks as {worker} with {threads} thread(s)")
+        executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        try:
+            while not self.stopping:
+                if executor is None:
+                    ran = self.run_batch(options["batch_size"], worker)
+                else:
+                    ran = sum(
+                        executor.map(
+                            self.run_batch,
+                            [options["batch_size"]] * threads,
+                            [f"{worker}/{number}" for number in range(threads)],
+                        )
+                    )
+                if ran:
+                    self.stdout.write(f"Ran {ran} task(s)")
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def run_batch(self, batch_size, worker):
+        try:
+            return run_pending(limit=batch_size, batch_size=batch_size, worker=worker)
+        finally:
+            close_old_connections()
+
+    def stop(self, signum, frame):
+        # finish the current batch, then exit
+        self.stopping = True
@@ -0,0 +1,230 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from apps.api.routers import pin_to_primary
+
+"""
+   Per-request SQL accounting.
+
+   QueryBudgetMiddleware counts the queries and DB time of each request and
+   groups SELECTs by shape (the SQL with literals and IN lists collapsed), so
+   the same SELECT running once per row, like OrderItem.item_subtotal loading
+   `product` without a prefetch, shows up as an N+1. Views declare what they
+   may spend with a `query_budget` attribute: an int, or a dict keyed by
+   viewset action / lower-case HTTP method.
+
+   The numbers go out as X-Query-* response headers and to the
+   "apps.api.queries" logger. With QUERY_BUDGET_STRICT (on under
+   `manage.py test`) a blown budget or an N+1 raises instead.
+   Streaming responses only query while being consumed, after this runs.
+"""
+
+logger = logging.getLogger("apps.api.queries")
+
+# silk's EXPLAINs and bookkeeping aren't the view's queries, and savepoints
+# depend on the caller (TestCase wraps every test in a transaction)
+IGNORED = re.compile(r'^\s*(EXPLAIN|SAVEPOINT|RELEASE|ROLLBACK)\b|"silk_')
+IN_LIST = re.compile(r"\bIN \((?:%s, )*%s\)")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+TABLE = re.compile(r'\bFROM "?(\w+)"?')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_shape(sql):
+    return LITERALS.sub("?", IN_LIST.sub("IN (...)", sql))
+
+
+class QueryStats:
+    """Collects queries through `connection.execute_wrapper`."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.selects = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if IGNORED.search(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            if sql.lstrip().upper().startswith("SELECT"):
+                self.selects[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        """(table, shape, times) for SELECT shapes run at least `threshold` times."""
+        return [
+            (table.group(1) if (table := TABLE.search(shape)) else "?", shape, times)
+            for shape, times in self.selects.items()
+            if times >= threshold
+        ]
+
+
+def _view_handler(view_func, request):
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    method = request.method.lower()
+    # DRF viewsets map HTTP methods to actions in as_view()
+    return view_class, (getattr(view_func, "actions", None) or {}).get(method, method)
+
+
+def view_name(view_func, request):
+    """"View.handler" (viewset action or HTTP method) for class-based views."""
+    view_class, handler = _view_handler(view_func, request)
+    if view_class is None:
+        return view_func.__qualname__
+    return f"{view_class.__name__}.{handler}"
+
+
+def view_budget(view_func, request):
+    """The `query_budget` the resolved view declares for this request, or None."""
+    view_class, handler = _view_handler(view_func, request)
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(handler)
+    return budget
+
+
+class AsyncCapableMiddleware:
+    """Base for middlewares that run as sync or async, whichever the chain is.
+
+    Under ASGI a sync-only middleware makes Django run every request behind
+    it, the async views included, through sync_to_async. Subclasses write
+    `__call__` for the sync chain and `__acall__` for the async one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            if hasattr(self, "process_view"):
+                # it only notes the view on the request, don't hop threads for it
+                sync_process_view = self.process_view
+
+                async def process_view(*args):
+                    return sync_process_view(*args)
+
+                self.process_view = process_view
+
+
+def count_queries(stack):
+    """QueryStats of this thread's connections, until `stack` is closed."""
+    stats = QueryStats()
+    # wrappers only, this doesn't open any database connection; an alias
+    # can share another's connection (test mirrors), count once
+    for connection in {id(conn): conn for conn in connections.all()}.values():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stats
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.strict = getattr(settings, "QUERY_BUDGET_STRICT", False)
+        self.threshold = getattr(settings, "QUERY_BUDGET_N_PLUS_ONE", 5)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with ExitStack() as stack:
+            stats = count_queries(stack)
+            response = self.get_response(request)
+        return self.check(request, response, stats)
+
+    async def __acall__(self, request):
+        # connections are per thread: watch the ones of the thread that runs
+        # this request's sync_to_async calls, the async ORM's included
+        stack = ExitStack()
+        stats = await sync_to_async(count_queries)(stack)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.check(request, response, stats)
+
+    def check(self, request, response, stats):
+        name, budget = getattr(request, "_query_budget", (request.path, None))
+        request._query_stats = stats
+        response["X-Query-Count"] = str(stats.count)
+        response["X-Query-Time-Ms"] = f"{stats.time * 1000:.1f}"
+        if budget is not None:
+            response["X-Query-Budget"] = str(budget)
+
+        problems = []
+        if budget is not None and stats.count > budget:
+            problems.append(f"{name} ran {stats.count} queries, budget is {budget}")
+        repeated = stats.repeated(self.threshold)
+        if repeated:
+            response["X-Query-N-Plus-One"] = ", ".join(
+                f"{table} x{times}" for table, _, times in repeated
+            )
+            problems += [
+                f"{name} ran the same SELECT on {table} {times} times: {shape}"
+                for table, shape, times in repeated
+            ]
+
+        if problems and self.strict:
+            raise QueryBudgetExceeded("; ".join(problems))
+        for problem in problems:
+            logger.warning(problem)
+        logger.debug(
+            "%s: %d queries in %.1fms",
+            name,
+            stats.count,
+            stats.time * 1000,
+            extra={
+                "view": name,
+                "queries": stats.count,
+                "query_time_ms": stats.time * 1000,
+                "query_budget": budget,
+            },
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = view_name(view_func, request), view_budget(view_func, request)
+
+
+class ReplicaPinMiddleware(AsyncCapableMiddleware):
+    """Pin users to the primary database for a moment after they write."""
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            # request.user may still be lazy, which loads from the database
+            await sync_to_async(self.pin)(request)
+        return response
+
+    def wrote(self, request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin(self, request):
+        # DRF copies the authenticated user (JWT included) onto the HttpRequest
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
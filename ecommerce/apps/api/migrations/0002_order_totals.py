@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("api", "Order")
+    OrderItem = apps.get_model("api", "OrderItem")
+    Product = apps.get_model("api", "Product")
+
+    OrderItem.objects.update(
+        unit_price=models.Subquery(
+            Product.objects.filter(pk=models.OuterRef("product_id")).values("price")[:1]
+        )
+    )
+    line_totals = (
+        OrderItem.objects.filter(order=models.OuterRef("pk"))
+        .values("order")
+        .annotate(total=models.Sum(models.F("unit_price") * models.F("quantity")))
+        .values("total")
+    )
+    Order.objects.update(
+        total_price=Coalesce(
+            models.Subquery(line_totals, output_field=models.DecimalField()),
+            models.Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.order'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, default=Decimal('0.00'), max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 12:30
+
+from django.db import migrations
+
+from apps.api.search import install_search_index, uninstall_search_index
+
+
+def forwards(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_order_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_hot_column_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('view', models.CharField(max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2000)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField(blank=True, null=True)),
+                ('query_time_ms', models.FloatField(blank=True, null=True)),
+                ('reason', models.CharField(choices=[('sampled', 'Sampled'), ('slow', 'Slow')], max_length=10)),
+                ('profile', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['view', 'created_at'], name='profile_view_created_idx')],
+            },
+        ),
+    ]
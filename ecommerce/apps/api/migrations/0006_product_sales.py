@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='api.product')),
+                ('units_sold', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-units_sold', 'product'], name='sales_units_idx'), models.Index(fields=['-revenue', 'product'], name='sales_revenue_idx')],
+            },
+        ),
+    ]
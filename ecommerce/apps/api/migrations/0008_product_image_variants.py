@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 18:00
+
+import apps.api.models
+from django.db import migrations, models
+
+from apps.api.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # sqlite adds the column by rebuilding api_product, which drops the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.api.models.product_image_path),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
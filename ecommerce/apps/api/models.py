@@ -1,11 +1,25 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
+import hashlib
 import uuid
+from decimal import Decimal
+from pathlib import Path
 
 # Create your models here.
 
 
+def product_image_path(instance, filename):
+    """products/<content hash><ext>, so a URL always serves the same bytes."""
+    digest = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+    return f"products/{digest.hexdigest()[:16]}{Path(filename).suffix.lower()}"
+
+
 class User(AbstractUser):
     pass
 
@@ -15,7 +29,41 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
-    image = models.ImageField(upload_to="products/", blank=True, null=True)
+    image = models.ImageField(upload_to=product_image_path, blank=True, null=True)
+    # resized copies of `image` written by apps.api.images: {"source": image
+    # name, variant: {format: name}}, empty until the worker has run
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["name"], name="product_name_idx"),
+            # iexact is UPPER(name) = UPPER(%s) on Postgres
+            models.Index(Upper("name"), name="product_name_upper_idx"),
+            # InStockFilterBackend: only the rows it can return, in pk order
+            models.Index(
+                fields=["id"], condition=models.Q(stock__gt=0), name="product_in_stock_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        if "image" in product.__dict__:
+            # the stored image, resize_product_image only schedules when it changes
+            product._stored_image = product.__dict__["image"] or ""
+        return product
+
+    def save(self, *args, **kwargs):
+        image = self.image
+        if image and not image._committed:
+            # same bytes, same name: reuse the stored file rather than saving
+            # a copy under a suffixed name
+            name = image.field.generate_filename(self, image.name)
+            if image.storage.exists(name):
+                image.name = name
+                image._committed = True
+        super().save(*args, **kwargs)
 
     @property
     def in_stock(self):
@@ -25,6 +73,24 @@ class Product(models.Model):
         return self.name
 
 
+class OrderQuerySet(models.QuerySet):
+    def update_totals(self):
+        """Recompute total_price for these orders with a single UPDATE."""
+        line_totals = (
+            OrderItem.objects.filter(order=models.OuterRef("pk"))
+            .values("order")
+            .annotate(total=models.Sum(models.F("unit_price") * models.F("quantity")))
+            .values("total")
+        )
+        return self.update(
+            total_price=Coalesce(
+                models.Subquery(line_totals, output_field=models.DecimalField()),
+                models.Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+
 class Order(models.Model):
     class StatusChoices(models.TextChoices):
         PENDING = "Pending"
@@ -40,6 +106,62 @@ class Order(models.Model):
     products = models.ManyToManyField(
         Product, through="OrderItem", related_name="order"
     )
+    # denormalized sum of items' unit_price * quantity, kept in sync by signals
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # OrderViewSet filters by user for non-staff, OrderFilter by
+            # status and create_at ranges
+            models.Index(fields=["user", "create_at"], name="order_user_created_idx"),
+            models.Index(fields=["status", "create_at"], name="order_status_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        from apps.api.order_events import order_changed, order_created
+        from apps.api.sales import order_lines
+        from apps.api.stock import release_stock, reserve_stock
+
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                order_created([self])
+            return
+
+        cancelled = self.StatusChoices.CANCELLED
+        confirmed = self.StatusChoices.CONFIRMED
+        with transaction.atomic():
+            # lock the row so two concurrent cancels can't both release stock
+            previous, previous_total = (
+                Order.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("status", "total_price")
+                .first()
+            ) or (None, None)
+            if previous is not None:
+                # the item signals own the total, an instance loaded before
+                # its last item write mustn't put back the old one
+                self.total_price = previous_total
+            stock_changes = previous is not None and (previous == cancelled) != (
+                self.status == cancelled
+            )
+            sales_change = previous is not None and (previous == confirmed) != (
+                self.status == confirmed
+            )
+            lines = order_lines(self) if stock_changes or sales_change else []
+            if stock_changes:
+                stock_lines = [(product_id, quantity) for _, product_id, quantity, _ in lines]
+                if self.status == cancelled:
+                    release_stock(stock_lines)
+                else:
+                    reserve_stock(stock_lines)
+            if previous is not None:
+                order_changed(self, previous, previous_total, lines if sales_change else None)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Order {self.order_id} by {self.user.username}"
@@ -49,11 +171,137 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    # price snapshot taken when the line is created, later price edits don't
+    # change historical orders
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
 
     @property
     def item_subtotal(self):
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quantity} * {self.product.name} in Order (self.order.order_id)"
 
+
+class ProductSales(models.Model):
+    """Sales of a product over confirmed orders, maintained by apps.api.sales."""
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="sales"
+    )
+    units_sold = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    # confirmed orders with at least one line of this product
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # bestsellers, by units or by revenue
+            models.Index(fields=["-units_sold", "product"], name="sales_units_idx"),
+            models.Index(fields=["-revenue", "product"], name="sales_revenue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units_sold} sold"
+
+
+class OrderRollup(models.Model):
+    """Orders created in one hour with one status, maintained by apps.api.analytics."""
+
+    bucket = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Order.StatusChoices.choices)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        constraints = [
+            # also the index for the bucket range of every report
+            models.UniqueConstraint(fields=["bucket", "status"], name="order_rollup_bucket_status_uniq")
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.status}: {self.orders}"
+
+
+class Task(models.Model):
+    """A queued job, see apps.api.tasks."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    # a running job past this is considered abandoned and runs again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # what workers poll: due queued jobs and expired claims
+            models.Index(fields=["status", "run_at"], name="task_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """The response of a request sent with an Idempotency-Key, see apps.api.idempotency."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body: a key can't be reused for another request
+    fingerprint = models.CharField(max_length=64)
+    # both null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_user_key_uniq")
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in flight'})"
+
+
+class RequestProfile(models.Model):
+    """A request kept by the sampling profiler (apps.api.profiling)."""
+
+    class Reason(models.TextChoices):
+        SAMPLED = "sampled"
+        SLOW = "slow"
+
+    created_at = models.DateTimeField(db_index=True)
+    view = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField(null=True, blank=True)
+    query_time_ms = models.FloatField(null=True, blank=True)
+    reason = models.CharField(max_length=10, choices=Reason.choices)
+    # pstats text of the top functions, sampled requests only
+    profile = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["view", "created_at"], name="profile_view_created_idx")]
+
+    def __str__(self):
+        return f"{self.method} {self.path} {self.duration_ms:.0f}ms ({self.reason})"
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.core.mail import send_mail
+from django.utils.dateparse import parse_datetime
+
+from apps.api.analytics import order_change, record_order_changes
+from apps.api.models import Order
+from apps.api.sales import confirmed_lines, record_sales
+from apps.api.tasks import enqueue, task
+
+"""
+   Order lifecycle events and the work they queue.
+
+   Checkout only does what has to be synchronous (validation, stock
+   reservation, the order rows). Created, confirmed and cancelled orders
+   queue everything downstream as tasks in the same transaction: the
+   ProductSales and OrderRollup deltas and the customer email. The deltas
+   commute, so they can run in any order and on any worker.
+
+   Deletes and admin edits of items still apply their deltas inline, they
+   aren't on the checkout path.
+"""
+
+NOTIFIED_STATUSES = {Order.StatusChoices.CONFIRMED, Order.StatusChoices.CANCELLED}
+
+
+@task("orders.record_sales")
+def record_sales_task(lines, sign):
+    record_sales(
+        [
+            (order_id, product_id, quantity, Decimal(price))
+            for order_id, product_id, quantity, price in lines
+        ],
+        sign,
+    )
+
+
+@task("orders.record_rollups")
+def record_rollups_task(changes):
+    record_order_changes(
+        [
+            (parse_datetime(created), status, orders, Decimal(revenue))
+            for created, status, orders, revenue in changes
+        ]
+    )
+
+
+@task("orders.notify", max_attempts=8)
+def notify_customer(order_id, event):
+    order = Order.objects.select_related("user").filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    send_mail(
+        f"Order {order.pk} {event}",
+        f"Hi {order.user.get_username()},\n\nyour order {order.pk} is {order.status.lower()}. "
+        f"Total: {order.total_price}.\n",
+        None,
+        [order.user.email],
+    )
+
+
+def order_created(orders, items=()):
+    """Queue the work of new orders, with their items when they already exist."""
+    jobs = [("orders.record_rollups", {"changes": [order_change(order) for order in orders]})]
+    jobs += [("orders.notify", {"order_id": order.pk, "event": "created"}) for order in orders]
+    lines = confirmed_lines(items)
+    if lines:
+        jobs.append(("orders.record_sales", {"lines": lines, "sign": 1}))
+    enqueue(jobs)
+
+
+def items_sold(items):
+    """Queue the sales of items added to new confirmed orders."""
+    lines = confirmed_lines(items)
+    if lines:
+        enqueue([("orders.record_sales", {"lines": lines, "sign": 1})])
+
+
+def order_changed(order, previous_status, previous_total, sold_lines=None):
+    """Queue the work of a saved order change.
+
+    `sold_lines` are the order's lines when it moved into or out of
+    Confirmed.
+    """
+    jobs = []
+    if sold_lines:
+        sign = 1 if order.status == Order.StatusChoices.CONFIRMED else -1
+        jobs.append(("orders.record_sales", {"lines": sold_lines, "sign": sign}))
+    if (previous_status, previous_total) != (order.status, order.total_price):
+        changes = [(order.create_at, previous_status, -1, -previous_total), order_change(order)]
+        jobs.append(("orders.record_rollups", {"changes": changes}))
+    if order.status != previous_status and order.status in NOTIFIED_STATUSES:
+        jobs.append(("orders.notify", {"order_id": order.pk, "event": order.status.lower()}))
+    if jobs:
+        enqueue(jobs)
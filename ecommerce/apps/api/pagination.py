@@ -0,0 +1,235 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ProductPageNumberPagination(PageNumberPagination):
+    """Page sizes for the product list, kept off the shared DRF class."""
+
+    page_size = 2
+    page_size_query_param = "size"
+    max_page_size = 5
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` with the COUNT and page fetched by the async ORM."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached_property, prime it instead of counting in sync
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        bottom = (number - 1) * page_size
+        rows = [obj async for obj in queryset[bottom : bottom + page_size]]
+        self.page = Page(rows, number, paginator)
+        return rows
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the ordering columns instead of OFFSET.
+
+    The ordering set on the queryset (by `order_by` or `OrderingFilter`) is
+    kept as long as every column is listed in the view's `ordering_fields`,
+    and `pk` is always appended as a tie-breaker so the ordering is total.
+    Each page is a single `WHERE (col1, col2, pk) > (...) LIMIT n` query, so
+    deep pages cost the same as the first one. `COUNT(*)` only runs when
+    the client asks for it with `?count=true`.
+    """
+
+    page_size = 10
+    page_size_query_param = "size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.page_queryset(queryset, request, view)
+        if self.include_count(request):
+            self.count = queryset.count()
+        return self.finish_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async twin of `paginate_queryset` for the async views."""
+        page = self.page_queryset(queryset, request, view)
+        if self.include_count(request):
+            self.count = await queryset.acount()
+        return self.finish_page([obj async for obj in page])
+
+    def page_queryset(self, queryset, request, view):
+        """The seek query for the requested page, one row longer than the page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.pk_name = queryset.model._meta.pk.attname
+        self.count = None
+
+        self.cursor_values, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [(field, not descending) for field, descending in ordering]
+
+        queryset = queryset.order_by(
+            *[("-" if descending else "") + field for field, descending in ordering]
+        )
+        if self.cursor_values is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, self.cursor_values))
+        # one extra row tells us whether there is another page after this one
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next = self.cursor_values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor_values is not None
+
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() in ("1", "true", "yes")
+
+    def get_ordering(self, queryset, view):
+        """Turn the queryset ordering into [(field, descending), ...]."""
+        allowed = set(getattr(view, "ordering_fields", None) or [])
+        ordering = []
+        for term in queryset.query.order_by:
+            if not isinstance(term, str):
+                continue
+            descending = term.startswith("-")
+            field = term.lstrip("-")
+            if field == "id":
+                field = "pk"
+            if field != "pk" and field not in allowed:
+                continue
+            ordering.append((field, descending))
+            if field == "pk":
+                break
+        if not any(field == "pk" for field, _ in ordering):
+            ordering.append(("pk", False))
+        return ordering
+
+    def seek_filter(self, ordering, values):
+        """Build (a > x) OR (a = x AND b > y) OR ... for the given ordering."""
+        condition = Q()
+        for index, (field, descending) in enumerate(ordering):
+            lookup = "lt" if descending else "gt"
+            term = Q(**{f"{field}__{lookup}": values[index]})
+            for prev_index, (prev_field, _) in enumerate(ordering[:index]):
+                term &= Q(**{prev_field: values[prev_index]})
+            condition |= term
+        return condition
+
+    def encode_cursor(self, instance, reverse):
+        values = []
+        for field, _ in self.ordering:
+            if isinstance(instance, dict):
+                # rows from a .values() queryset (the fast list serializers)
+                value = instance[self.pk_name if field == "pk" else field]
+            else:
+                value = getattr(instance, field)
+            if isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = data["v"]
+            reverse = bool(data.get("r", 0))
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # cursors come from the client, a tampered one mustn't reach the query
+        try:
+            values = [
+                (model._meta.pk if field == "pk" else model._meta.get_field(field)).to_python(value)
+                for (field, _), value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+
+class ProductKeysetPagination(KeysetPagination):
+    page_size = 2
+    max_page_size = 5
+
+
+class ProductInfoPagination(KeysetPagination):
+    page_size = 50
+    max_page_size = 500
@@ -0,0 +1,85 @@
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from apps.api.cache import invalidate_products_on_commit
+from apps.api.models import Product
+from apps.api.serializers import ProductUpsertSerializer
+
+"""
+   Bulk product upserts for catalog syncs (POST /products/bulk/).
+
+   Every record goes through a single ProductUpsertSerializer instance, the
+   way ListSerializer validates its children, so `validate_price` and the
+   field checks run once per record without building a serializer for each.
+   The ids the records reference are checked with one query.
+
+   Valid records are written in chunks, one transaction and one
+   `bulk_create(update_conflicts=True)` per chunk (two statements when a
+   chunk mixes new and existing products). A chunk the database rejects is
+   reported and the others still commit. The product caches are
+   invalidated once at the end, not once per row.
+"""
+
+UPSERT_FIELDS = ["name", "description", "price", "stock"]
+
+
+def _record_id(record):
+    value = record.get("id") if isinstance(record, dict) else None
+    # isdecimal, not isdigit: "²" is a digit that int() can't parse, the
+    # serializer reports it as an invalid id
+    return int(value) if str(value).isdecimal() else None
+
+
+def validate_records(records):
+    """Validate sync records; returns (rows, results).
+
+    `rows` are (index, validated data) of the valid records, `results` has
+    one entry per record, with the errors of the invalid ones.
+    """
+    ids = {record_id for record_id in map(_record_id, records) if record_id}
+    existing_ids = set(Product.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    serializer = ProductUpsertSerializer(context={"existing_ids": existing_ids})
+
+    rows, results, seen = [], [], set()
+    for index, record in enumerate(records):
+        result = {"index": index}
+        results.append(result)
+        try:
+            data = serializer.run_validation(record)
+        except serializers.ValidationError as exc:
+            result.update(status="invalid", errors=exc.detail)
+            continue
+        record_id = data.get("id")
+        if record_id is not None and record_id in seen:
+            result.update(status="invalid", errors={"id": ["Duplicate id in this batch."]})
+            continue
+        seen.add(record_id)
+        rows.append((index, data))
+    return rows, results
+
+
+def upsert_products(rows, results, chunk_size=1000):
+    """Write validated rows and fill in their results; returns the products written."""
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        products = [Product(**data) for _, data in chunk]
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=["id"],
+                    update_fields=UPSERT_FIELDS,
+                )
+        except DatabaseError as exc:
+            for index, _ in chunk:
+                results[index].update(status="failed", errors={"non_field_errors": [str(exc)]})
+            continue
+        for (index, data), product in zip(chunk, products):
+            status = "updated" if "id" in data else "created"
+            results[index].update(id=product.pk, status=status)
+        written += len(products)
+    if written:
+        invalidate_products_on_commit()
+    return written
@@ -0,0 +1,229 @@
+import atexit
+import bisect
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.api.middleware import AsyncCapableMiddleware, view_name
+from apps.api.models import RequestProfile
+
+"""
+   Sampling profiler, the always-on replacement for silk.
+
+   Every request pays for two clock reads and a histogram bump. Only a
+   PROFILING_SAMPLE_RATE fraction runs under cProfile, and only those plus
+   requests slower than PROFILING_SLOW_REQUEST_MS become RequestProfile
+   rows. Rows wait in a bounded in-memory buffer (oldest dropped when full)
+   and a background thread writes them with one bulk_create every
+   PROFILING_FLUSH_INTERVAL seconds, so requests never wait on the write.
+
+   Histograms are per process; with several workers each one answers for
+   its own traffic.
+"""
+
+logger = logging.getLogger("apps.api.profiling")
+
+# upper bounds in ms, the last bucket is everything slower
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, duration_ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th request (None past the last)."""
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (None,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                str(bound): count for bound, count in zip(BUCKETS_MS + ("+Inf",), self.counts)
+            },
+        }
+
+
+class LatencyHistograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, view, duration_ms):
+        with self.lock:
+            histogram = self.views.get(view)
+            if histogram is None:
+                histogram = self.views[view] = LatencyHistogram()
+            histogram.add(duration_ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {view: histogram.as_dict() for view, histogram in sorted(self.views.items())}
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+class RecordBuffer:
+    """Unsaved RequestProfile rows, written in batches by a daemon thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=getattr(settings, "PROFILING_BUFFER_SIZE", 1000))
+        self.dropped = 0
+        self.pid = None
+
+    def add(self, record):
+        with self.lock:
+            if len(self.records) == self.records.maxlen:
+                self.dropped += 1
+            self.records.append(record)
+        interval = getattr(settings, "PROFILING_FLUSH_INTERVAL", 5)
+        # per process: a thread started before a fork doesn't exist in the child
+        if interval and self.pid != os.getpid():
+            self.start(interval)
+
+    def start(self, interval):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        threading.Thread(
+            target=self.run, args=(interval,), name="profiling-flush", daemon=True
+        ).start()
+        atexit.register(self.flush)
+
+    def run(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch = list(self.records)
+            self.records.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning("Profiling buffer full, dropped %d records", dropped)
+        if not batch:
+            return 0
+        try:
+            RequestProfile.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Couldn't write %d profiling records", len(batch))
+            return 0
+        finally:
+            # this thread's connection follows CONN_MAX_AGE like a request's
+            close_old_connections()
+        return len(batch)
+
+
+histograms = LatencyHistograms()
+buffer = RecordBuffer()
+
+
+def format_profile(profiler, limit=25):
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+class SamplingProfilerMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.slow_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", None)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profiler = self.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        return self.record(request, response, profiler, started)
+
+    async def __acall__(self, request):
+        # under ASGI a sampled profile also sees the other requests the
+        # event loop runs in the meantime
+        profiler = self.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        return self.record(request, response, profiler, started)
+
+    def start(self):
+        if not (self.sample_rate and random.random() < self.sample_rate):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 3.12+ runs one profiler per process, another request has it
+            return None
+        return profiler
+
+    def record(self, request, response, profiler, started):
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        view = getattr(request, "_profiling_view", "<unresolved>")
+        histograms.add(view, duration_ms)
+        slow = self.slow_ms is not None and duration_ms >= self.slow_ms
+        if profiler is not None or slow:
+            # QueryBudgetMiddleware, when it runs inside this one
+            stats = getattr(request, "_query_stats", None)
+            reason = RequestProfile.Reason.SAMPLED if profiler else RequestProfile.Reason.SLOW
+            buffer.add(
+                RequestProfile(
+                    created_at=timezone.now(),
+                    view=view,
+                    method=request.method,
+                    path=request.get_full_path()[:2000],
+                    status_code=response.status_code,
+                    duration_ms=duration_ms,
+                    queries=stats.count if stats else None,
+                    query_time_ms=stats.time * 1000 if stats else None,
+                    reason=reason,
+                    profile=format_profile(profiler) if profiler else "",
+                )
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_view = view_name(view_func, request)
@@ -0,0 +1,67 @@
+import decimal
+import math
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+   JSON rendering with orjson when it's installed.
+
+   FastJSONRenderer writes the same bytes as DRF's JSONRenderer with the
+   default COMPACT_JSON, UNICODE_JSON and STRICT_JSON settings: datetimes
+   and times still go through DRF's encoder (millisecond precision, "Z"
+   for UTC), Decimals are written as the float repr the stdlib would
+   write, and U+2028/U+2029 are escaped. Only values that are already
+   floats in the data can differ: exponents are spelled "1e-5" instead of
+   "1e-05", and NaN is written as null where DRF raises. The API's
+   numbers are Decimals.
+
+   Indented output (the browsable API, ?indent), other JSON settings and
+   anything orjson can't encode (ints past 64 bits, say) go through
+   JSONRenderer as before, which is also all that runs without orjson.
+"""
+
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+def fast_json_available():
+    return orjson is not None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not (self.compact and not self.ensure_ascii and self.strict)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.encoder_class()
+
+        def default(obj):
+            if isinstance(obj, decimal.Decimal):
+                value = float(obj)
+                if not math.isfinite(value):
+                    raise ValueError("Out of range float values are not JSON compliant")
+                return orjson.Fragment(float.__repr__(value))
+            return encoder.default(obj)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # the stdlib path raises its usual error if it can't either
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"\xe2\x80" in ret:
+            for raw, escaped in LINE_SEPARATORS:
+                ret = ret.replace(raw, escaped)
+        return ret
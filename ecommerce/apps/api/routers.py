@@ -0,0 +1,86 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+"""
+   Primary/replica routing.
+
+   Writes always go to "default". Reads go there too unless the current
+   request opted in through ReplicaReadMixin, in which case every read of
+   that request uses one replica from DATABASE_REPLICAS (one per request, so
+   a COUNT and its page see the same snapshot). Views opt in per safe
+   method or per viewset action.
+
+   A user who just wrote is pinned to the primary for
+   DATABASE_REPLICA_PIN_SECONDS (ReplicaPinMiddleware), so they read their
+   own writes while the replicas catch up. Pins live in the "default" cache;
+   use a shared cache when running several workers.
+"""
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    timeout = getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5)
+    caches["default"].set(_pin_key(user_id), True, timeout)
+
+
+def pinned_to_primary(user_id):
+    return caches["default"].get(_pin_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {"default", *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve safe requests of a DRF view from a replica.
+
+    `replica_actions` limits it to some viewset actions; None means every
+    safe method of the view.
+    """
+
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # after authentication, so JWT users are known for the pin check
+        replicas = replica_aliases()
+        if replicas and self.reads_from_replica(request):
+            self._read_alias_token = _read_alias.set(random.choice(replicas))
+
+    def reads_from_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        if self.replica_actions is not None and self.action not in self.replica_actions:
+            return False
+        user = request.user
+        return not (user.is_authenticated and pinned_to_primary(user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = self.__dict__.pop("_read_alias_token", None)
+        if token is not None:
+            _read_alias.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
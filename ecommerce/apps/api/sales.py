@@ -0,0 +1,133 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    Count,
+    DecimalField,
+    F,
+    IntegerField,
+    Sum,
+    Value,
+    When,
+)
+
+from apps.api.models import Order, OrderItem, ProductSales
+
+"""
+   Units sold and revenue per product, kept in ProductSales.
+
+   Sales are the lines of confirmed orders. Instead of aggregating every
+   OrderItem on read, each status change into or out of Confirmed adds or
+   subtracts that order's lines (queued by apps.api.order_events, inline
+   in the pre_delete signal), so reading a product's figures is one row.
+
+   Bulk loads that skip those paths (populate_db's bulk_create, admin edits
+   to the items of a confirmed order) can leave the table behind;
+   `rebuild_product_sales` recomputes it from the orders.
+"""
+
+
+def confirmed_lines(items):
+    """(order_id, product_id, quantity, unit_price) for the items of confirmed orders."""
+    return [
+        (item.order_id, item.product_id, item.quantity, item.unit_price)
+        for item in items
+        if item.order.status == Order.StatusChoices.CONFIRMED
+    ]
+
+
+def order_lines(order):
+    return [
+        (order.pk, product_id, quantity, unit_price)
+        for product_id, quantity, unit_price in order.items.values_list(
+            "product_id", "quantity", "unit_price"
+        )
+    ]
+
+
+def _by_product(deltas, output_field):
+    return Case(
+        *(When(product_id=product_id, then=Value(delta)) for product_id, delta in deltas),
+        output_field=output_field,
+    )
+
+
+def record_sales(lines, sign=1):
+    """Add (sign=1) or take back (sign=-1) order lines from ProductSales.
+
+    Three queries however many products: create the missing rows, lock the
+    rows in product id order (like `reserve_stock`, so concurrent
+    confirmations can't deadlock) and apply every delta in one UPDATE.
+    """
+    totals = defaultdict(lambda: [0, Decimal("0.00"), set()])
+    for order_id, product_id, quantity, unit_price in lines:
+        total = totals[product_id]
+        total[0] += quantity
+        total[1] += unit_price * quantity
+        total[2].add(order_id)
+    if not totals:
+        return
+    with transaction.atomic():
+        # first sale of a product creates its row
+        ProductSales.objects.bulk_create(
+            [ProductSales(product_id=product_id) for product_id in totals],
+            ignore_conflicts=True,
+        )
+        rows = ProductSales.objects.filter(product_id__in=totals)
+        list(rows.select_for_update().order_by("product_id").values_list("product_id"))
+        rows.update(
+            units_sold=F("units_sold")
+            + _by_product(
+                ((product, sign * units) for product, (units, _, _) in totals.items()),
+                BigIntegerField(),
+            ),
+            revenue=F("revenue")
+            + _by_product(
+                ((product, sign * revenue) for product, (_, revenue, _) in totals.items()),
+                DecimalField(max_digits=14, decimal_places=2),
+            ),
+            orders=F("orders")
+            + _by_product(
+                ((product, sign * len(orders)) for product, (_, _, orders) in totals.items()),
+                IntegerField(),
+            ),
+        )
+
+
+def rebuild_product_sales(batch_size=1000):
+    """Recompute ProductSales from every confirmed order; returns the row count.
+
+    Incremental updates that commit while this runs can be lost, run it
+    when no orders are being confirmed or cancelled.
+    """
+    totals = (
+        OrderItem.objects.filter(order__status=Order.StatusChoices.CONFIRMED)
+        .values("product")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(
+                F("unit_price") * F("quantity"),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            order_count=Count("order", distinct=True),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        rows = ProductSales.objects.bulk_create(
+            [
+                ProductSales(
+                    product_id=row["product"],
+                    units_sold=row["units"],
+                    revenue=row["revenue"],
+                    orders=row["order_count"],
+                )
+                for row in totals.iterator()
+            ],
+            batch_size=batch_size,
+        )
+    return len(rows)
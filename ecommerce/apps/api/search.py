@@ -0,0 +1,149 @@
+import re
+
+from django.db import connections
+from rest_framework import filters
+
+"""
+   Full-text search over Product.name / Product.description.
+
+   SQLite uses an external-content FTS5 table (`api_product_fts`) kept in sync
+   by triggers, Postgres uses a GIN index over the same tsvector expression we
+   query with. Both are created by migration 0003; any other backend, or a
+   SQLite build without FTS5, falls back to DRF's icontains SearchFilter.
+"""
+
+FTS_TABLE = "api_product_fts"
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, content='api_product', content_rowid='id', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF name, description ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_FTS_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# the query has to use the exact indexed expression for the GIN index to apply
+PG_DOCUMENT = (
+    "to_tsvector('english'::regconfig, "
+    "coalesce(\"api_product\".\"name\", '') || ' ' || "
+    "coalesce(\"api_product\".\"description\", ''))"
+)
+PG_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS api_product_search_gin ON api_product "
+    "USING GIN ((to_tsvector('english'::regconfig, "
+    "coalesce(name, '') || ' ' || coalesce(description, ''))))"
+)
+PG_DROP_INDEX_SQL = "DROP INDEX IF EXISTS api_product_search_gin"
+
+_available = {}
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def install_search_index(schema_editor):
+    """Create the vendor's search index. Safe to re-run, e.g. after a
+    migration rebuilds api_product on SQLite and drops its triggers."""
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite" and sqlite_has_fts5(connection):
+        for sql in SQLITE_FTS_SQL:
+            schema_editor.execute(sql)
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(PG_INDEX_SQL)
+    _available.clear()
+
+
+def uninstall_search_index(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        for sql in SQLITE_DROP_FTS_SQL:
+            schema_editor.execute(sql)
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(PG_DROP_INDEX_SQL)
+    _available.clear()
+
+
+def search_index_available(using):
+    if using not in _available:
+        connection = connections[using]
+        if connection.vendor == "sqlite":
+            tables = connection.introspection.table_names()
+            _available[using] = FTS_TABLE in tables
+        else:
+            _available[using] = connection.vendor == "postgresql"
+    return _available[using]
+
+
+def search_tokens(terms):
+    return [token for term in terms for token in re.findall(r"\w+", term)]
+
+
+def full_text_search(queryset, terms):
+    """Filter `queryset` to products matching every term as a prefix.
+
+    Adds a `search_rank` column (higher is better) and orders by it.
+    Returns None when there is no usable index, so callers can fall back.
+    """
+    tokens = search_tokens(terms)
+    if not tokens or not search_index_available(queryset.db):
+        return None
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        match = " ".join('"%s"*' % token for token in tokens)
+        # bm25 is "lower is better"; weight name hits 10x over description
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = api_product.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={"search_rank": f"-bm25({FTS_TABLE}, 10.0, 1.0)"},
+        ).order_by("-search_rank", "pk")
+
+    tsquery = " & ".join(f"{token}:*" for token in tokens)
+    return queryset.extra(
+        where=[f"{PG_DOCUMENT} @@ to_tsquery('english', %s)"],
+        params=[tsquery],
+        select={"search_rank": f"ts_rank({PG_DOCUMENT}, to_tsquery('english', %s))"},
+        select_params=[tsquery],
+    ).order_by("-search_rank", "pk")
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the full-text index when there is one.
+
+    Results are ranked by relevance unless the client passes an explicit
+    `?ordering=`, in which case OrderingFilter re-orders them as usual.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        results = full_text_search(queryset, terms)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results
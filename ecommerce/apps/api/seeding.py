@@ -0,0 +1,189 @@
+import multiprocessing
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.utils import lorem_ipsum
+
+from apps.api.analytics import backfill_order_rollups
+from apps.api.cache import invalidate_products
+from apps.api.models import Order, OrderItem, Product, User
+from apps.api.sales import rebuild_product_sales
+
+"""
+   Synthetic data for populate_db and the benchmarks.
+
+   Every table is topped up to a target size in batches. A batch is one
+   bulk_create per table inside one transaction, and gets its own RNG seeded
+   from (seed, table, position), so the generated rows are the same whatever
+   the worker count. With workers > 1 the batches run in forked processes,
+   each with its own DB connection.
+
+   bulk_create skips the model signals, so order totals and unit prices are
+   computed here, and the product cache, sales table and order rollups are
+   refreshed once at the end.
+"""
+
+BENCH_USER_PREFIX = "bench-user-"
+BENCH_PASSWORD = "bench"
+STATUSES = [choice for choice, _ in Order.StatusChoices.choices]
+
+# per-process copy of what order batches pick from, see _order_refs()
+_refs = {}
+
+
+def _rng(seed, kind, start):
+    return random.Random(f"{seed}:{kind}:{start}")
+
+
+def _order_refs():
+    if "products" not in _refs:
+        _refs["users"] = list(User.objects.order_by("pk").values_list("pk", flat=True))
+        _refs["products"] = list(Product.objects.order_by("pk").values_list("pk", "price"))
+    return _refs
+
+
+def _password():
+    # hashing is the slow part of creating users, every bench user shares one
+    if "password" not in _refs:
+        _refs["password"] = make_password(BENCH_PASSWORD)
+    return _refs["password"]
+
+
+def create_products(start, count, seed, items_per_order):
+    rng = _rng(seed, "products", start)
+    batch = [
+        Product(
+            name=" ".join(rng.sample(lorem_ipsum.WORDS, 3)).title(),
+            description=" ".join(rng.choices(lorem_ipsum.WORDS, k=20)),
+            price=Decimal(rng.randint(100, 100_000)) / 100,
+            # deep stock so order-create traffic doesn't run the catalog dry
+            stock=rng.randint(1_000, 100_000),
+        )
+        for _ in range(count)
+    ]
+    with transaction.atomic():
+        Product.objects.bulk_create(batch)
+    return count
+
+
+def create_users(start, count, seed, items_per_order):
+    password = _password()
+    batch = [
+        User(username=f"{BENCH_USER_PREFIX}{index}", password=password)
+        for index in range(start, start + count)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(batch)
+    return count
+
+
+def create_orders(start, count, seed, items_per_order):
+    """One batch of orders; returns rows written, orders plus items."""
+    rng = _rng(seed, "orders", start)
+    refs = _order_refs()
+    user_ids, product_prices = refs["users"], refs["products"]
+    items_per_order = min(items_per_order, len(product_prices))
+    orders, items = [], []
+    for _ in range(count):
+        order = Order(
+            user_id=rng.choice(user_ids),
+            status=rng.choice(STATUSES),
+            total_price=Decimal("0.00"),
+        )
+        for product_id, price in rng.sample(product_prices, items_per_order):
+            quantity = rng.randint(1, 5)
+            # ids rather than instances skip the related-object checks in bulk_create
+            items.append(
+                OrderItem(
+                    order_id=order.pk, product_id=product_id, unit_price=price, quantity=quantity
+                )
+            )
+            order.total_price += price * quantity
+        orders.append(order)
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items)
+    return len(orders) + len(items)
+
+
+def _run_batch(args):
+    create, start, count, seed, items_per_order = args
+    return count, create(start, count, seed, items_per_order)
+
+
+def _seed_table(create, start, missing, options, pool, progress):
+    batch_size = options["batch_size"]
+    tasks = [
+        (create, start + offset, min(batch_size, missing - offset))
+        + (options["seed"], options["items_per_order"])
+        for offset in range(0, missing, batch_size)
+    ]
+    results = pool.imap_unordered(_run_batch, tasks) if pool else map(_run_batch, tasks)
+    done = rows = 0
+    started = time.perf_counter()
+    for count, written in results:
+        done += count
+        rows += written
+        if progress is not None:
+            progress(done, missing, rows, time.perf_counter() - started)
+    return done
+
+
+def seed_dataset(
+    products=0,
+    users=0,
+    orders=0,
+    items_per_order=3,
+    seed=0,
+    batch_size=5000,
+    workers=1,
+    progress=None,
+):
+    """Top the catalog, bench users and orders up to the given sizes.
+
+    `progress(table, done, total, rows, seconds)` is called after every
+    batch. sqlite allows a single writer, so it always runs one worker.
+    Returns how many rows of each table were created.
+    """
+    if connection.vendor == "sqlite":
+        workers = 1
+    options = {"seed": seed, "items_per_order": items_per_order, "batch_size": batch_size}
+    # batches start at the current row count, so a top-up continues the sequence
+    plan = [
+        ("products", create_products, Product.objects.count(), products),
+        (
+            "users",
+            create_users,
+            User.objects.filter(username__startswith=BENCH_USER_PREFIX).count(),
+            users,
+        ),
+        ("orders", create_orders, Order.objects.count(), orders),
+    ]
+
+    created = {}
+    for table, create, start, total in plan:
+        created[table] = 0
+        missing = total - start
+        if missing <= 0:
+            continue
+        # reference rows change as tables fill up, reload them per table
+        _refs.clear()
+        table_progress = progress and (lambda *args, table=table: progress(table, *args))
+        if workers > 1:
+            # children get fresh connections instead of sharing the parent's socket
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                created[table] = _seed_table(create, start, missing, options, pool, table_progress)
+        else:
+            created[table] = _seed_table(create, start, missing, options, None, table_progress)
+    _refs.clear()
+
+    if created["products"]:
+        invalidate_products()
+    if created["orders"]:
+        rebuild_product_sales()
+        backfill_order_rollups()
+    return created
@@ -1,4 +1,13 @@
-from .models import User, Order, Product, OrderItem
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import DEFAULT_SPANS, INTERVALS
+from .images import image_urls
+from .models import User, Order, Product, OrderItem, ProductSales
+from .order_events import items_sold, order_created
+from .stock import InsufficientStock, reserve_stock
 from rest_framework import serializers
 
 """
@@ -7,6 +16,10 @@ from rest_framework import serializers
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    # uploads come in as `image`, the URLs of it and its variants go out as `images`
+    image = serializers.ImageField(required=False, allow_null=True, write_only=True)
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = (
@@ -15,14 +28,34 @@ class ProductSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "stock",
+            "image",
+            "images",
         )
 
+    def get_images(self, product):
+        return image_urls(product.image.name, product.image_variants)
+
     def validate_price(self, value):
         if value < 0:
             raise serializers.ValidationError("Price must be greater than 0.")
         return value
 
 
+class ProductUpsertSerializer(ProductSerializer):
+    """A catalog sync record: with an `id` it replaces that product, without one it's new.
+
+    `existing_ids` in the context holds the ids known to exist, looked up
+    once for the whole batch.
+    """
+
+    id = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_id(self, value):
+        if value not in self.context["existing_ids"]:
+            raise serializers.ValidationError(f"Product {value} does not exist.")
+        return value
+
+
 """
       #   read_only = () -> can only get the values from client but Not permission to update or create operations !!
       #   write_only = () -> can perform create and update operation
@@ -44,6 +77,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "product_name",
             "product_price",
             "product_description",
+            "unit_price",
             "quantity",
             "item_subtotal",
         )
@@ -54,11 +88,10 @@ class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(
         many=True, read_only=True
     )  # if you don't use the structure it will only provide the product ids and quantity only
-    total_price = serializers.SerializerMethodField(method_name="total_order_price")
-
-    def total_order_price(self, obj):
-        order_items = obj.items.all()
-        return sum(order_item.item_subtotal for order_item in order_items)
+    # stored on the order and kept in sync on item writes, no per-row summing
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True
+    )
 
     class Meta:
         model = Order
@@ -71,29 +104,139 @@ class OrderSerializer(serializers.ModelSerializer):
             "total_price",
         )
 
+    def update(self, instance, validated_data):
+        # un-cancelling reserves the stock again (Order.save)
+        try:
+            return super().update(instance, validated_data)
+        except InsufficientStock as exc:
+            raise stock_error(exc)
+
+
+def load_related(context, orders_data):
+    """Fetch every product and user referenced by the incoming orders.
+
+    One `in_bulk` query per model; the results are kept in the serializer
+    context so each `BatchPrimaryKeyField` resolves its id from memory
+    instead of running its own `SELECT`.
+    """
+    product_ids, user_ids = set(), set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict):
+            continue
+        if str(order_data.get("user", "")).isdecimal():
+            user_ids.add(int(order_data["user"]))
+        for item in order_data.get("items") or []:
+            if isinstance(item, dict) and str(item.get("product", "")).isdecimal():
+                product_ids.add(int(item["product"]))
+    context["products"] = Product.objects.in_bulk(product_ids)
+    context["users"] = User.objects.in_bulk(user_ids)
+
+
+class BatchPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, batch_key, **kwargs):
+        self.batch_key = batch_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        objects = self.context.get(self.batch_key)
+        if objects is None:
+            return super().to_internal_value(data)
+        # isdecimal, not isdigit: "²" is a digit that int() can't parse
+        if isinstance(data, bool) or not str(data).isdecimal():
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        obj = objects.get(int(data))
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+
+def stock_error(exc):
+    return serializers.ValidationError(
+        {"items": [f"Product {exc.product_id} does not have enough stock."]}
+    )
+
+
+def reserve_order_stock(items):
+    # an order created as cancelled holds nothing, un-cancelling it reserves
+    try:
+        reserve_stock(
+            (item.product_id, item.quantity)
+            for item in items
+            if item.order.status != Order.StatusChoices.CANCELLED
+        )
+    except InsufficientStock as exc:
+        raise stock_error(exc)
+
+
+class OrderCreateListSerializer(serializers.ListSerializer):
+    """Creates many orders with two INSERTs in total, for B2B batch uploads."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            load_related(self.context, data)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        orders = []
+        items = []
+        for order_data in validated_data:
+            order, order_items = self.child.build_order(order_data)
+            orders.append(order)
+            items.extend(order_items)
+        with transaction.atomic():
+            reserve_order_stock(items)
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+            order_created(orders, items)
+        return orders
+
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     class OrderItemCreateSerializer(serializers.ModelSerializer):
+        product = BatchPrimaryKeyField("products", queryset=Product.objects.all())
+
         class Meta:
             model = OrderItem
             fields = ["product", "quantity"]
 
+    user = BatchPrimaryKeyField("users", queryset=User.objects.all())
     items = OrderItemCreateSerializer(many=True)
-    total_price = serializers.SerializerMethodField(method_name="total_order_price")
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True
+    )
 
-    def total_order_price(self, obj):
-        order_items = obj.items.all()
-        return sum(order_item.item_subtotal for order_item in order_items)
+    def to_internal_value(self, data):
+        if "products" not in self.context:
+            load_related(self.context, [data])
+        return super().to_internal_value(data)
 
-    def create(self, validated_data):
+    def build_order(self, validated_data):
+        """Unsaved order and items, with unit prices and the total filled in."""
         orderitem_data = validated_data.pop("items")
-        order = Order.objects.create(**validated_data)
-        for item in orderitem_data:
-            OrderItem.objects.create(order=order, **item)
+        order = Order(**validated_data)
+        items = [
+            OrderItem(order=order, unit_price=item["product"].price, **item)
+            for item in orderitem_data
+        ]
+        order.total_price = sum(
+            (item.item_subtotal for item in items), Decimal("0.00")
+        )
+        # serve order.items.all() from memory when the response is rendered
+        order._prefetched_objects_cache = {"items": items}
+        return order, items
+
+    def create(self, validated_data):
+        order, items = self.build_order(validated_data)
+        with transaction.atomic():
+            reserve_order_stock(items)
+            order.save(force_insert=True)
+            OrderItem.objects.bulk_create(items)
+            items_sold(items)
         return order
 
     class Meta:
         model = Order
+        list_serializer_class = OrderCreateListSerializer
         fields = (
             "user",
             "status",
@@ -103,7 +246,47 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
 
 class ProductInfoSerializer(serializers.Serializer):
-    # get all product, count of products, max price
-    products = ProductSerializer(many=True)
+    # catalog stats from one aggregate, plus an optional page of products
+    products = ProductSerializer(many=True, required=False)
+    next = serializers.URLField(required=False)
     count = serializers.IntegerField()
     max_price = serializers.FloatField()
+    min_price = serializers.FloatField()
+    avg_price = serializers.FloatField()
+    total_stock = serializers.IntegerField()
+    in_stock_count = serializers.IntegerField()
+
+
+class ProductSalesSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.name")
+
+    class Meta:
+        model = ProductSales
+        fields = (
+            "product",
+            "product_name",
+            "units_sold",
+            "revenue",
+            "orders",
+        )
+
+
+class OrderAnalyticsQuerySerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(choices=list(INTERVALS), default="day")
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=Order.StatusChoices.choices, required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault("start", attrs["end"] - DEFAULT_SPANS[attrs["interval"]])
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError({"start": ["Must be before end."]})
+        return attrs
+
+
+class OrderBucketSerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField(source="period")
+    status = serializers.CharField()
+    orders = serializers.IntegerField(source="order_count")
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, source="revenue_total")
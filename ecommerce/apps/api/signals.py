@@ -0,0 +1,84 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.api.analytics import record_order_changes
+from apps.api.authentication import invalidate_user
+from apps.api.cache import invalidate_products_on_commit
+from apps.api.images import schedule_variants
+from apps.api.models import Order, OrderItem, Product, User
+from apps.api.sales import order_lines, record_sales
+from apps.api.stock import release_stock
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total(sender, instance, origin=None, **kwargs):
+    if origin is not None and not (
+        isinstance(origin, OrderItem) or getattr(origin, "model", None) is OrderItem
+    ):
+        # cascade from deleting the order (or its user), which goes away too
+        return
+    orders = Order.objects.filter(pk=instance.order_id)
+    with transaction.atomic():
+        previous = (
+            orders.select_for_update().values_list("create_at", "status", "total_price").first()
+        )
+        if previous is None:
+            return
+        orders.update_totals()
+        created, order_status, total = previous
+        change = orders.values_list("total_price", flat=True).get() - total
+        record_order_changes([(created, order_status, 0, change)])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_products_on_commit()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def resize_product_image(sender, instance, created, **kwargs):
+    name = instance.image.name or ""
+    stored = "" if created else getattr(instance, "_stored_image", None)
+    if stored is None:
+        # not loaded with its image: compare with what the variants were built from
+        stored = instance.image_variants.get("source", "")
+    instance._stored_image = name
+    # also when the image was removed, to drop the old variants
+    if name != stored:
+        transaction.on_commit(partial(schedule_variants, instance.pk, name))
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order(sender, instance, **kwargs):
+    # the stored row, not `instance`: a cancel or item writes since it was
+    # loaded changed the status and total. Locked, like Order.save, so a
+    # concurrent cancel can't release the stock too
+    stored = (
+        Order.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("status", "total_price")
+        .first()
+    )
+    if stored is None:
+        return
+    order_status, total = stored
+    record_order_changes([(instance.create_at, order_status, -1, -total)])
+    if order_status == Order.StatusChoices.CANCELLED:
+        # a cancelled order already gave its stock back
+        return
+    # before the cascade takes the items with it
+    lines = order_lines(instance)
+    if order_status == Order.StatusChoices.CONFIRMED:
+        record_sales(lines, -1)
+    release_stock((product_id, quantity) for _, product_id, quantity, _ in lines)
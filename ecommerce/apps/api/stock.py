@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.api.cache import invalidate_products_on_commit, invalidate_stock_on_commit
+from apps.api.models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, quantity):
+        self.product_id = product_id
+        self.quantity = quantity
+        super().__init__(f"Not enough stock for product {product_id} (wanted {quantity})")
+
+
+def _merge_lines(lines):
+    """Sum quantities per product and sort by product id.
+
+    Always touching rows in ascending pk order means two checkouts that share
+    products take their row locks in the same order and can't deadlock.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    return sorted(quantities.items())
+
+
+def _invalidate(product_ids, sold_out_changed):
+    # a product selling out or coming back changes which products the
+    # in-stock lists hold, otherwise only responses showing them are stale
+    if sold_out_changed:
+        invalidate_products_on_commit()
+    elif product_ids:
+        invalidate_stock_on_commit(product_ids)
+
+
+def reserve_stock(lines, using=None):
+    """Atomically take stock for [(product_id, quantity), ...].
+
+    Each product is a single `UPDATE ... SET stock = stock - n WHERE stock > n`,
+    so the check and the decrement can't race and the row lock is only held
+    until the surrounding transaction commits; taking the last units is a
+    second UPDATE. If any line can't be satisfied the whole reservation is
+    rolled back and `InsufficientStock` is raised.
+    """
+    products = Product.objects.using(using) if using else Product.objects
+    lines = _merge_lines(lines)
+    sold_out = False
+    with transaction.atomic(using=using):
+        for product_id, quantity in lines:
+            updated = products.filter(pk=product_id, stock__gt=quantity).update(
+                stock=F("stock") - quantity
+            )
+            if not updated:
+                if not products.filter(pk=product_id, stock=quantity).update(stock=0):
+                    raise InsufficientStock(product_id, quantity)
+                sold_out = True
+        _invalidate([product_id for product_id, _ in lines], sold_out)
+
+
+def release_stock(lines, using=None):
+    """Give back stock taken by `reserve_stock`, e.g. when an order is cancelled."""
+    products = Product.objects.using(using) if using else Product.objects
+    lines = _merge_lines(lines)
+    back_in_stock = False
+    with transaction.atomic(using=using):
+        for product_id, quantity in lines:
+            added = F("stock") + quantity
+            if not products.filter(pk=product_id, stock__gt=0).update(stock=added):
+                back_in_stock |= bool(products.filter(pk=product_id).update(stock=added))
+        _invalidate([product_id for product_id, _ in lines], back_in_stock)
@@ -0,0 +1,169 @@
+import logging
+import os
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.api.models import Task
+
+"""
+   A durable job queue in the database.
+
+   `enqueue` writes Task rows in the caller's transaction, so a job exists
+   exactly when the order (or whatever queued it) commits. After the commit
+   an in-process pool of TASK_QUEUE_WORKERS threads runs the new jobs right
+   away; `manage.py run_tasks` polls the table for everything else: retries,
+   jobs of crashed processes and, with no in-process workers, all of them.
+
+   A job is claimed with a conditional UPDATE, so a pool thread and a
+   worker never both run it. Its function runs in one transaction with the
+   "done" update, so a job that only writes to the database takes effect
+   once. A failed job is retried with exponential backoff and jitter up to
+   its `max_attempts`, then left as failed with the traceback.
+"""
+
+logger = logging.getLogger("apps.api.tasks")
+
+registry = {}
+
+
+class WorkerPool:
+    """A ThreadPoolExecutor sized by a setting, created per process on first use."""
+
+    def __init__(self, setting, name):
+        self.setting = setting
+        self.name = name
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    @property
+    def workers(self):
+        return getattr(settings, self.setting, 0)
+
+    def submit(self, function, *args):
+        with self.lock:
+            # a pool created before a fork has no threads in the child
+            if self.pid != os.getpid():
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name
+                )
+                self.pid = os.getpid()
+            return self.executor.submit(function, *args)
+
+
+pool = WorkerPool("TASK_QUEUE_WORKERS", "tasks")
+
+
+def task(name, max_attempts=5):
+    """Register a function as the job `name`; its payload is passed as kwargs."""
+
+    def register(function):
+        function.task_name = name
+        function.max_attempts = max_attempts
+        registry[name] = function
+        return function
+
+    return register
+
+
+def enqueue(jobs, delay=0):
+    """Queue [(name, payload), ...] with one INSERT; returns the Task rows."""
+    run_at = timezone.now() + timedelta(seconds=delay)
+    tasks = Task.objects.bulk_create(
+        [Task(name=name, payload=payload, run_at=run_at) for name, payload in jobs]
+    )
+    if pool.workers and not delay:
+        transaction.on_commit(partial(_submit, [task.pk for task in tasks]))
+    return tasks
+
+
+def _submit(task_ids):
+    for task_id in task_ids:
+        pool.submit(_run_in_pool, task_id)
+
+
+def _run_in_pool(task_id):
+    try:
+        run_task(task_id, worker=f"pool-{os.getpid()}")
+    except Exception:
+        logger.exception("Task %s crashed the pool thread", task_id)
+    finally:
+        close_old_connections()
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: doubling from the base, capped, jittered."""
+    delay = min(settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claimable(now):
+    # queued and due, or claimed by a worker that died before finishing
+    return Q(status=Task.Status.QUEUED, run_at__lte=now) | Q(
+        status=Task.Status.RUNNING, locked_until__lt=now
+    )
+
+
+def run_task(task_id, worker=""):
+    """Claim and run one job; returns False when someone else has it or it isn't due."""
+    now = timezone.now()
+    claimed = Task.objects.filter(claimable(now), pk=task_id).update(
+        status=Task.Status.RUNNING,
+        attempts=F("attempts") + 1,
+        locked_until=now + timedelta(seconds=settings.TASK_TIMEOUT),
+        worker=worker,
+    )
+    if not claimed:
+        return False
+
+    job = Task.objects.get(pk=task_id)
+    function = registry.get(job.name)
+    try:
+        if function is None:
+            raise LookupError(f"No task registered as {job.name!r}")
+        with transaction.atomic():
+            function(**job.payload)
+            Task.objects.filter(pk=job.pk).update(
+                status=Task.Status.DONE, finished_at=timezone.now(), last_error=""
+            )
+    except Exception:
+        error = traceback.format_exc()
+        if function is None or job.attempts >= function.max_attempts:
+            logger.error("Task %s (%s) failed for good:\n%s", job.pk, job.name, error)
+            Task.objects.filter(pk=job.pk).update(
+                status=Task.Status.FAILED, finished_at=timezone.now(), last_error=error
+            )
+        else:
+            delay = backoff(job.attempts)
+            logger.warning("Task %s (%s) failed, retrying in %.0fs", job.pk, job.name, delay)
+            Task.objects.filter(pk=job.pk).update(
+                status=Task.Status.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+    return True
+
+
+def run_pending(limit=None, batch_size=100, worker=""):
+    """Run due jobs, oldest first, until none is left or `limit` ran; returns how many."""
+    ran = 0
+    while limit is None or ran < limit:
+        size = batch_size if limit is None else min(batch_size, limit - ran)
+        due = list(
+            Task.objects.filter(claimable(timezone.now()))
+            .order_by("run_at", "pk")
+            .values_list("pk", flat=True)[:size]
+        )
+        if not due:
+            break
+        ran += sum(run_task(task_id, worker=worker) for task_id in due)
+    return ran
@@ -1,12 +1,77 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from PIL import Image
 from rest_framework import status
-from apps.api.models import Order, User
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from apps.api.fast_serializers import product_rows, serialize_orders, serialize_products
+from apps.api import profiling
+from apps.api.analytics import backfill_order_rollups
+from apps.api.authentication import users as cached_users
+from apps.api.idempotency import claim
+from apps.api.middleware import QueryBudgetExceeded, QueryBudgetMiddleware
+from apps.api.models import (
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OrderRollup,
+    Product,
+    ProductSales,
+    RequestProfile,
+    Task,
+    User,
+)
+from apps.api.parsers import FastJSONParser
+from apps.api.renderers import FastJSONRenderer
+from apps.api.routers import PrimaryReplicaRouter
+from apps.api.tasks import run_pending, run_task, task
+from apps.api.seeding import seed_dataset
+from apps.api.serializers import OrderSerializer, ProductSerializer
+from apps.api.stock import release_stock, reserve_stock
+from apps.api.views import ProductInfoListApiView
 
 # Create your tests here.
 
 
+def api_queries(captured):
+    # silk logs (and EXPLAINs) every query into the same database, skip those
+    return [
+        q["sql"]
+        for q in captured.captured_queries
+        if '"api_' in q["sql"]
+        and "silk_" not in q["sql"]
+        and not q["sql"].startswith("EXPLAIN")
+    ]
+
+
 class UserOrderTestCase(TestCase):
     def setUp(self):
         user1 = User.objects.create_user(username="user1", password="test")
@@ -31,3 +96,1283 @@ class UserOrderTestCase(TestCase):
         self.assertEqual(
             response.status_code, status.HTTP_401_UNAUTHORIZED
         )  # Forbidden for unauthenticated users
+
+
+class ProductKeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        for index, price in enumerate(["5.00", "9.99", "9.99", "1.50", "20.00"]):
+            Product.objects.create(
+                name=f"Product {index}",
+                description="desc",
+                price=Decimal(price),
+                stock=index,
+            )
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payload = response.json()
+            self.assertNotIn("count", payload)
+            seen.extend(product["id"] for product in payload["results"])
+            url = payload["next"]
+        return seen
+
+    def test_keyset_pages_follow_ordering_with_pk_tie_breaker(self):
+        seen = self.walk("/products/?pagination=keyset&ordering=-price")
+        expected = list(
+            Product.objects.filter(stock__gt=0)
+            .order_by("-price", "pk")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_keyset_previous_link_returns_prior_page(self):
+        first = self.client.get("/products/?pagination=keyset&ordering=name").json()
+        second = self.client.get(first["next"]).json()
+        previous = self.client.get(second["previous"]).json()
+        self.assertEqual(previous["results"], first["results"])
+
+    def test_malformed_cursor_is_not_found(self):
+        for raw in (b'{"v":["abc"],"r":0}', b'{"v":[[1]],"r":0}', b"not json"):
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            response = self.client.get(f"/products/?pagination=keyset&cursor={cursor}")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_keyset_count_only_when_requested(self):
+        response = self.client.get("/products/?pagination=keyset&count=true")
+        self.assertEqual(response.json()["count"], 4)
+
+
+class ProductInfoTestCase(TestCase):
+    def setUp(self):
+        for index, (price, stock) in enumerate([("10.00", 0), ("30.00", 4)]):
+            Product.objects.create(
+                name=f"Product {index}", description="desc", price=price, stock=stock
+            )
+
+    def test_stats_come_from_one_aggregate_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get("/products/info/?products=false")
+        self.assertEqual(len(api_queries(captured)), 1)
+        data = response.json()
+        self.assertNotIn("products", data)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["max_price"], 30.0)
+        self.assertEqual(data["min_price"], 10.0)
+        self.assertEqual(data["avg_price"], 20.0)
+        self.assertEqual(data["total_stock"], 4)
+        self.assertEqual(data["in_stock_count"], 1)
+
+    def test_products_are_paginated(self):
+        response = self.client.get("/products/info/?size=1")
+        data = response.json()
+        self.assertEqual(len(data["products"]), 1)
+        self.assertIsNotNone(data["next"])
+
+
+class OrderTotalTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price=Decimal("10.00"), stock=5
+        )
+
+    def test_total_tracks_item_writes_and_ignores_later_price_changes(self):
+        order = Order.objects.create(user=self.user)
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal("30.00"))
+
+        self.product.price = Decimal("99.00")
+        self.product.save()
+        item.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal("10.00"))
+
+    def test_saving_a_stale_order_keeps_its_total(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        # `order` still holds the 0.00 it was created with
+        order.status = Order.StatusChoices.CONFIRMED
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal("10.00"))
+        run_pending()
+        self.assertEqual(
+            {(row.status, row.orders, row.revenue) for row in OrderRollup.objects.exclude(orders=0)},
+            {("Confirmed", 1, Decimal("10.00"))},
+        )
+
+    def test_orders_can_be_sorted_by_total(self):
+        cheap = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=cheap, product=self.product, quantity=1)
+        dear = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=dear, product=self.product, quantity=3)
+
+        self.client.force_login(self.user)
+        response = self.client.get("/orders/?ordering=-total_price")
+        totals = [order["total_price"] for order in response.json()]
+        self.assertEqual(totals, [30.0, 10.0])
+
+
+class OrderCreateTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        self.products = [
+            Product.objects.create(
+                name=f"Product {index}", description="desc", price="2.50", stock=9
+            )
+            for index in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def order_payload(self, quantities):
+        return {
+            "user": self.user.pk,
+            "status": "Pending",
+            "items": [
+                {"product": product.pk, "quantity": quantity}
+                for product, quantity in zip(self.products, quantities)
+            ],
+        }
+
+    def test_create_order_validates_products_in_one_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(
+                "/orders/", self.order_payload([1, 2, 3]), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["total_price"], 15.0)
+        product_selects = [
+            sql for sql in api_queries(captured) if sql.startswith('SELECT "api_product"')
+        ]
+        self.assertEqual(len(product_selects), 1)
+        self.assertEqual(OrderItem.objects.count(), 3)
+
+    def test_bulk_create_orders(self):
+        payload = [self.order_payload([1, 1, 1]), self.order_payload([4])]
+        response = self.client.post("/orders/bulk/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([order["total_price"] for order in response.json()], [7.5, 10.0])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 4)
+
+    def test_unknown_product_is_rejected(self):
+        payload = self.order_payload([1])
+        payload["items"][0]["product"] = 999
+        response = self.client.post("/orders/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_non_numeric_ids_are_rejected(self):
+        payload = self.order_payload([1])
+        payload["user"] = "²"
+        payload["items"][0]["product"] = "²"
+        response = self.client.post("/orders/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("user", response.json())
+        self.assertIn("product", response.json()["items"][0])
+
+
+class StockReservationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=3
+        )
+        self.client.force_login(self.user)
+
+    def place_order(self, *quantities):
+        return self.client.post(
+            "/orders/",
+            {
+                "user": self.user.pk,
+                "items": [
+                    {"product": self.product.pk, "quantity": quantity}
+                    for quantity in quantities
+                ],
+            },
+            content_type="application/json",
+        )
+
+    def test_order_reserves_stock_and_rejects_oversell(self):
+        self.assertEqual(self.place_order(1, 1).status_code, status.HTTP_201_CREATED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+        response = self.place_order(2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancelling_an_order_releases_stock(self):
+        self.place_order(3)
+        order = Order.objects.get()
+        response = self.client.patch(
+            f"/orders/{order.pk}/", {"status": "Cancelled"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+        # saving it again as cancelled must not release twice
+        order.refresh_from_db()
+        order.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_orders_created_cancelled_reserve_on_uncancel_only(self):
+        response = self.client.post(
+            "/orders/",
+            {
+                "user": self.user.pk,
+                "status": "Cancelled",
+                "items": [{"product": self.product.pk, "quantity": 2}],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+        path = f"/orders/{Order.objects.get().pk}/"
+        self.place_order(2)
+        response = self.client.patch(path, {"status": "Pending"}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("items", response.json())
+        self.assertEqual(Order.objects.filter(status="Cancelled").count(), 1)
+
+        Product.objects.filter(pk=self.product.pk).update(stock=3)
+        response = self.client.patch(path, {"status": "Pending"}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_deleting_an_order_releases_stock(self):
+        self.place_order(2)
+        response = self.client.delete(f"/orders/{Order.objects.get().pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+
+class ProductResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=3
+        )
+        self.url = f"/products/{self.product.pk}/"
+
+    def test_repeat_get_is_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["name"], "Lamp")
+        self.assertEqual(api_queries(captured), [])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_product_write_invalidates_cached_pages(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.get("/products/")
+        self.product.name = "Desk Lamp"
+        self.product.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["name"], "Desk Lamp")
+        listing = self.client.get("/products/").json()
+        self.assertEqual(listing["results"][0]["name"], "Desk Lamp")
+
+    def test_stock_changes_only_stale_responses_showing_that_product(self):
+        other = Product.objects.create(name="Desk", description="desc", price="50.00", stock=2)
+        self.client.get(self.url)
+        self.client.get("/products/?size=5")
+        self.client.get("/products/info/?products=false")
+
+        reserve_stock([(other.pk, 1)])
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(self.url)
+        self.assertEqual(api_queries(captured), [])
+        listing = self.client.get("/products/?size=5").json()["results"]
+        self.assertEqual([product["stock"] for product in listing], [3, 1])
+        info = self.client.get("/products/info/?products=false").json()
+        self.assertEqual(info["total_stock"], 4)
+
+        # selling out takes it off the in-stock list
+        reserve_stock([(other.pk, 1)])
+        listing = self.client.get("/products/?size=5").json()["results"]
+        self.assertEqual([product["name"] for product in listing], ["Lamp"])
+        release_stock([(other.pk, 1)])
+        self.assertEqual(len(self.client.get("/products/?size=5").json()["results"]), 2)
+
+
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        Product.objects.create(
+            name="Coffee Machine", description="Brews espresso", price="70.99", stock=6
+        )
+        Product.objects.create(
+            name="Teapot", description="Pairs well with a coffee grinder", price="9.99", stock=2
+        )
+        self.watch = Product.objects.create(
+            name="Watch", description="Swiss movement", price="500.05", stock=1
+        )
+
+    def search(self, term, **params):
+        response = self.client.get("/products/", {"search": term, "size": 5, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product["name"] for product in response.json()["results"]]
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        self.assertEqual(self.search("coff"), ["Coffee Machine", "Teapot"])
+
+    def test_index_follows_product_writes(self):
+        self.watch.description = "Espresso timer"
+        self.watch.save()
+        self.assertEqual(sorted(self.search("espresso")), ["Coffee Machine", "Watch"])
+        self.watch.delete()
+        self.assertEqual(self.search("espresso"), ["Coffee Machine"])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search("coffee", ordering="price"), ["Teapot", "Coffee Machine"])
+
+
+class ExplainEndpointsCommandTestCase(TestCase):
+    def test_explains_every_get_endpoint(self):
+        admin = User.objects.create_superuser(username="admin", password="test")
+        Product.objects.create(name="Lamp", description="desc", price="10.00", stock=3)
+        Order.objects.create(user=admin)
+        out = StringIO()
+        call_command("explain_endpoints", "--query", "/orders/?status=Pending", stdout=out)
+        output = out.getvalue()
+        for url in ["/products/", "/products/info/", "/orders/", "/orders/?status=Pending"]:
+            self.assertIn(f"GET {url} -> 200", output)
+        self.assertNotIn("/orders/bulk/", output)
+        self.assertIn("order_status_created_idx", output)
+
+
+class OrderExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=9
+        )
+        for order_status in ["Pending", "Confirmed", "Pending"]:
+            order = Order.objects.create(user=self.user, status=order_status)
+            OrderItem.objects.create(order=order, product=product, quantity=2)
+        self.client.force_login(self.user)
+
+    def test_ndjson_export_streams_filtered_orders(self):
+        response = self.client.get("/orders/export/", {"status": "Pending"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row["status"] == "Pending" for row in rows))
+        self.assertEqual(rows[0]["items"][0]["product_name"], "Lamp")
+
+    def test_csv_export_writes_one_row_per_item(self):
+        response = self.client.get("/orders/export/", {"as": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["order_id", "user"])
+        self.assertEqual(len(lines), 4)
+
+
+class FastSerializerParityTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        products = [
+            Product.objects.create(
+                name=f"Product {index}", description="desc", price=price, stock=9
+            )
+            for index, price in enumerate(["10.00", "0.50", "1234.99"])
+        ]
+        for quantities in [(1, 2, 3), (4,), ()]:
+            order = Order.objects.create(user=self.user)
+            for product, quantity in zip(products, quantities):
+                OrderItem.objects.create(order=order, product=product, quantity=quantity)
+
+    def test_orders_match_order_serializer(self):
+        queryset = Order.objects.prefetch_related("items__product").order_by("create_at")
+        expected = JSONRenderer().render(OrderSerializer(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(serialize_orders(queryset)), expected)
+
+    def test_products_match_product_serializer(self):
+        queryset = Product.objects.order_by("pk")
+        expected = JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+        fast = serialize_products(list(product_rows(queryset)))
+        self.assertEqual(JSONRenderer().render(fast), expected)
+
+    def test_user_orders_only_lists_own_orders(self):
+        other = User.objects.create_user(username="other", password="test")
+        Order.objects.create(user=other)
+        self.client.force_login(self.user)
+        orders = self.client.get("/orders/user-orders/").json()
+        self.assertEqual(len(orders), 3)
+        self.assertTrue(all(order["user"] == self.user.pk for order in orders))
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        for index, price in enumerate(["5.00", "9.99", "1.50"]):
+            product = Product.objects.create(
+                name=f"Product {index}", description="desc", price=price, stock=index
+            )
+        self.order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=self.order, product=product, quantity=1)
+
+    def assertSameAsSync(self, path, **params):
+        sync = self.client.get(path, params)
+        asynchronous = self.client.get(f"/async{path}", params)
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        # links in the body point back at whichever route served them
+        body = asynchronous.content.decode().replace("/async/", "/")
+        self.assertEqual(json.loads(body), sync.json())
+
+    def test_product_endpoints_match_sync_views(self):
+        product = Product.objects.first()
+        self.assertSameAsSync("/products/", ordering="-price")
+        self.assertSameAsSync("/products/", pagination="keyset", price__gt="2")
+        self.assertSameAsSync("/products/", page="9")
+        self.assertSameAsSync("/products/info/", size="1")
+        self.assertSameAsSync(f"/products/{product.pk}/")
+        self.assertSameAsSync("/products/999/")
+
+    def test_order_endpoints_require_auth_and_match_sync_views(self):
+        response = self.client.get("/async/orders/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_login(self.user)
+        self.assertSameAsSync("/orders/", status="Pending")
+        self.assertSameAsSync(f"/orders/{self.order.pk}/")
+
+
+class SeedDatasetTestCase(TestCase):
+    def test_tops_tables_up_with_consistent_orders(self):
+        created = seed_dataset(products=20, users=3, orders=10, items_per_order=2, seed=1)
+        self.assertEqual(created, {"products": 20, "users": 3, "orders": 10})
+        self.assertEqual(OrderItem.objects.count(), 20)
+        for order in Order.objects.prefetch_related("items"):
+            self.assertEqual(
+                order.total_price, sum(item.item_subtotal for item in order.items.all())
+            )
+
+        # already at size, nothing more to create
+        created = seed_dataset(products=20, users=3, orders=10, seed=1)
+        self.assertEqual(created, {"products": 0, "users": 0, "orders": 0})
+
+
+class QueryBudgetMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        for index in range(6):
+            product = Product.objects.create(
+                name=f"Product {index}", description="desc", price="2.50", stock=10
+            )
+            order = Order.objects.create(user=self.user)
+            OrderItem.objects.create(order=order, product=product, quantity=1)
+
+    def test_reports_queries_and_budget_in_headers(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/orders/")
+        self.assertEqual(response["X-Query-Budget"], "4")
+        self.assertLessEqual(int(response["X-Query-Count"]), 4)
+        self.assertIn("X-Query-Time-Ms", response)
+        self.assertNotIn("X-Query-N-Plus-One", response)
+
+    def test_detects_n_plus_one(self):
+        def view(request):
+            # no prefetch: every item loads its product on its own
+            OrderSerializer(Order.objects.prefetch_related("items"), many=True).data
+            return HttpResponse()
+
+        request = RequestFactory().get("/orders/")
+        with override_settings(QUERY_BUDGET_STRICT=False):
+            with self.assertLogs("apps.api.queries", "WARNING") as logs:
+                response = QueryBudgetMiddleware(view)(request)
+        self.assertEqual(response["X-Query-N-Plus-One"], "api_product x6")
+        self.assertIn("same SELECT on api_product 6 times", logs.output[0])
+
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                QueryBudgetMiddleware(view)(request)
+
+    def test_strict_mode_fails_over_budget_views(self):
+        class TightView(ProductInfoListApiView):
+            query_budget = 1
+
+        request = RequestFactory().get("/products/info/")
+        view = TightView.as_view()
+        middleware = QueryBudgetMiddleware(lambda request: view(request))
+        middleware.process_view(request, view, (), {})
+        with self.assertRaisesRegex(QueryBudgetExceeded, "TightView.get ran 2 queries"):
+            middleware(request)
+
+    async def test_counts_async_views_on_the_async_chain(self):
+        response = await self.async_client.get("/async/products/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Query-Budget"], "5")
+        self.assertEqual(int(response["X-Query-Count"]), 2)
+
+    def test_order_update_reloads_items_in_bulk(self):
+        self.client.force_login(self.user)
+        order = Order.objects.first()
+        for product in Product.objects.all()[1:]:
+            OrderItem.objects.create(order=order, product=product, quantity=1)
+        response = self.client.patch(
+            f"/orders/{order.pk}/", {"status": "Confirmed"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["items"]), 6)
+        self.assertNotIn("X-Query-N-Plus-One", response)
+
+
+class SamplingProfilerTestCase(TestCase):
+    def setUp(self):
+        profiling.buffer.records.clear()
+        profiling.histograms.clear()
+        Product.objects.create(name="Lamp", description="desc", price="9.99", stock=2)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_REQUEST_MS=None)
+    def test_sampled_requests_are_profiled_and_flushed_in_a_batch(self):
+        self.client.get("/products/info/")
+        self.client.get("/products/info/?products=false")
+        self.assertEqual(RequestProfile.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(profiling.buffer.flush(), 2)
+        self.assertEqual(len(api_queries(captured)), 1)
+        record = RequestProfile.objects.first()
+        self.assertEqual(record.view, "ProductInfoListApiView.get")
+        self.assertEqual(record.reason, RequestProfile.Reason.SAMPLED)
+        self.assertIn("cumulative", record.profile)
+        self.assertIsNotNone(record.queries)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_recorded_without_a_profile(self):
+        self.client.get("/products/")
+        profiling.buffer.flush()
+        record = RequestProfile.objects.get()
+        self.assertEqual(record.reason, RequestProfile.Reason.SLOW)
+        self.assertEqual(record.profile, "")
+
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_REQUEST_MS=None)
+    def test_latency_histogram_endpoint(self):
+        for _ in range(3):
+            self.client.get("/products/")
+        self.assertEqual(profiling.buffer.flush(), 0)
+
+        admin = User.objects.create_superuser(username="admin", password="test")
+        self.client.force_login(admin)
+        data = self.client.get("/profiling/latency/").json()
+        histogram = data["ProductListCreateApiView.get"]
+        self.assertEqual(histogram["count"], 3)
+        self.assertEqual(sum(histogram["buckets"].values()), 3)
+        self.assertIsNotNone(histogram["p99_ms"])
+
+        self.client.force_login(User.objects.create_user(username="buyer"))
+        response = self.client.get("/profiling/latency/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_REQUEST_MS=0)
+    async def test_async_views_are_recorded_on_the_async_chain(self):
+        await self.async_client.get("/async/products/")
+        record = profiling.buffer.records[0]
+        self.assertEqual(record.view, "AsyncProductListView.get")
+        self.assertIsNotNone(record.queries)
+
+    def test_no_middleware_needs_a_sync_hop_under_asgi(self):
+        # with DEBUG on, Django logs every middleware it has to adapt
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            BaseHandler().load_middleware(is_async=True)
+
+
+@override_settings(DATABASE_REPLICAS=["test_replica"])
+class ReplicaRoutingTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # two connections can't share sqlite's in-memory test db inside the
+        # test transaction, so the replica alias reuses the default connection
+        cls.replica_connection = connections["test_replica"]
+        connections["test_replica"] = connections["default"]
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["test_replica"] = cls.replica_connection
+        super().tearDownClass()
+
+    def setUp(self):
+        # pins outlive the rolled-back test, and sqlite hands out the same pks again
+        cache.clear()
+        self.user = User.objects.create_user(username="buyer", password="test")
+        product = Product.objects.create(name="Lamp", description="desc", price="9.99", stock=5)
+        self.order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=self.order, product=product, quantity=1)
+
+    def read_aliases(self, method, path, **extra):
+        aliases = set()
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            # session and user lookups run before the view picks a database
+            if model in (Order, OrderItem, Product):
+                aliases.add(alias)
+            return alias
+
+        with mock.patch.object(PrimaryReplicaRouter, "db_for_read", spy):
+            response = getattr(self.client, method)(path, content_type="application/json", **extra)
+        self.assertLess(response.status_code, 400)
+        return aliases
+
+    def test_safe_reads_of_opted_in_views_use_the_replica(self):
+        self.assertEqual(self.read_aliases("get", "/products/?search=lamp"), {"test_replica"})
+        self.assertEqual(self.read_aliases("get", "/products/info/"), {"test_replica"})
+        self.client.force_login(self.user)
+        self.assertEqual(self.read_aliases("get", "/orders/"), {"test_replica"})
+        self.assertEqual(self.read_aliases("get", f"/orders/{self.order.pk}/"), {"test_replica"})
+        # not opted in
+        self.assertEqual(self.read_aliases("get", "/orders/user-orders/"), {"default"})
+        self.assertEqual(self.read_aliases("get", "/products/1/"), {"default"})
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        self.client.force_login(self.user)
+        self.assertEqual(
+            self.read_aliases("patch", f"/orders/{self.order.pk}/", data={"status": "Confirmed"}),
+            {"default"},
+        )
+        self.assertEqual(self.read_aliases("get", "/orders/"), {"default"})
+        # other users still read from the replica
+        self.client.force_login(User.objects.create_user(username="other"))
+        self.assertEqual(self.read_aliases("get", "/orders/"), {"test_replica"})
+
+
+class ProductSalesTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="test")
+        self.lamp = Product.objects.create(name="Lamp", description="desc", price="10.00", stock=50)
+        self.desk = Product.objects.create(name="Desk", description="desc", price="80.00", stock=50)
+        self.client.force_login(self.admin)
+
+    def place_order(self, order_status, **quantities):
+        response = self.client.post(
+            "/orders/",
+            {
+                "user": self.admin.pk,
+                "status": order_status,
+                "items": [
+                    {"product": getattr(self, name).pk, "quantity": quantity}
+                    for name, quantity in quantities.items()
+                ],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        run_pending()
+        return Order.objects.latest("create_at")
+
+    def sales(self, product):
+        run_pending()
+        row = ProductSales.objects.filter(product=product).first()
+        return (row.units_sold, row.revenue, row.orders) if row else None
+
+    def test_confirming_and_cancelling_update_the_totals(self):
+        pending = self.place_order("Pending", lamp=2)
+        self.assertIsNone(self.sales(self.lamp))
+        self.place_order("Confirmed", lamp=1, desk=1)
+        self.assertEqual(self.sales(self.lamp), (1, Decimal("10.00"), 1))
+
+        self.client.patch(
+            f"/orders/{pending.pk}/", {"status": "Confirmed"}, content_type="application/json"
+        )
+        self.assertEqual(self.sales(self.lamp), (3, Decimal("30.00"), 2))
+        pending.refresh_from_db()
+        pending.status = Order.StatusChoices.CANCELLED
+        pending.save()
+        self.assertEqual(self.sales(self.lamp), (1, Decimal("10.00"), 1))
+        # cancelling again changes nothing
+        pending.save()
+        self.assertEqual(self.sales(self.lamp), (1, Decimal("10.00"), 1))
+
+        Order.objects.filter(status=Order.StatusChoices.CONFIRMED).delete()
+        self.assertEqual(self.sales(self.lamp), (0, Decimal("0.00"), 0))
+
+    def test_deleting_a_stale_instance_goes_by_the_stored_status(self):
+        order = self.place_order("Pending", lamp=2)
+        confirmed = Order.objects.get(pk=order.pk)
+        confirmed.status = Order.StatusChoices.CONFIRMED
+        confirmed.save()
+        self.assertEqual(self.sales(self.lamp), (2, Decimal("20.00"), 1))
+
+        # `order` still says Pending
+        order.delete()
+        self.assertEqual(self.sales(self.lamp), (0, Decimal("0.00"), 0))
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 50)
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.place_order("Confirmed", lamp=1, desk=2)
+        self.place_order("Confirmed", lamp=3)
+        self.place_order("Cancelled", desk=5)
+        incremental = {row.pk: self.sales(row.product) for row in ProductSales.objects.all()}
+        out = StringIO()
+        call_command("rebuild_product_sales", stdout=out)
+        self.assertIn("Rebuilt sales of 2 products", out.getvalue())
+        rebuilt = {row.pk: self.sales(row.product) for row in ProductSales.objects.all()}
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(rebuilt[self.desk.pk], (2, Decimal("160.00"), 1))
+
+    def test_bestsellers_and_product_sales_endpoints(self):
+        self.place_order("Confirmed", lamp=5, desk=1)
+        by_units = self.client.get("/products/bestsellers/").json()
+        self.assertEqual([row["product_name"] for row in by_units], ["Lamp", "Desk"])
+        by_revenue = self.client.get("/products/bestsellers/?by=revenue&limit=1").json()
+        self.assertEqual(by_revenue, [
+            {
+                "product": self.desk.pk,
+                "product_name": "Desk",
+                "units_sold": 1,
+                "revenue": "80.00",
+                "orders": 1,
+            }
+        ])
+        unsold = Product.objects.create(name="Rug", description="desc", price="5.00", stock=1)
+        response = self.client.get(f"/products/{unsold.pk}/sales/")
+        self.assertEqual(response.json()["units_sold"], 0)
+        self.assertEqual(self.client.get("/products/999/sales/").status_code, 404)
+
+        self.client.logout()
+        response = self.client.get("/products/bestsellers/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class OrderAnalyticsTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="test")
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=50
+        )
+        self.client.force_login(self.admin)
+
+    def place_order(self, quantity, order_status="Pending"):
+        order = Order.objects.create(user=self.admin, status=order_status)
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+    def rollups(self):
+        run_pending()
+        return {
+            (row.status, row.orders, row.revenue)
+            for row in OrderRollup.objects.exclude(orders=0, revenue=0)
+        }
+
+    def test_rollups_follow_order_writes_and_match_a_backfill(self):
+        first = self.place_order(2)
+        self.place_order(1, "Confirmed")
+        first.refresh_from_db()
+        first.status = Order.StatusChoices.CANCELLED
+        first.save()
+        item = OrderItem.objects.create(order=first, product=self.product, quantity=1)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(
+            self.rollups(),
+            {("Cancelled", 1, Decimal("50.00")), ("Confirmed", 1, Decimal("10.00"))},
+        )
+        incremental = self.rollups()
+        self.assertEqual(backfill_order_rollups(), 2)
+        self.assertEqual(self.rollups(), incremental)
+
+        first.delete()
+        self.assertEqual(self.rollups(), {("Confirmed", 1, Decimal("10.00"))})
+
+    def test_bulk_created_orders_are_counted(self):
+        payload = [
+            {"user": self.admin.pk, "items": [{"product": self.product.pk, "quantity": 1}]},
+            {"user": self.admin.pk, "items": [{"product": self.product.pk, "quantity": 4}]},
+        ]
+        response = self.client.post("/orders/bulk/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rollups(), {("Pending", 2, Decimal("50.00"))})
+
+    def test_endpoint_buckets_by_interval_and_status(self):
+        self.place_order(1)
+        self.place_order(2, "Confirmed")
+        old = self.place_order(4, "Confirmed")
+        # orders from before the rollups existed only show up after a backfill
+        Order.objects.filter(pk=old.pk).update(create_at=old.create_at - timedelta(days=3))
+        call_command("backfill_order_rollups", stdout=StringIO())
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get("/orders/analytics/?interval=day")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([sql for sql in api_queries(captured) if '"api_order"' in sql])
+        buckets = response.json()["buckets"]
+        self.assertEqual(
+            [(row["status"], row["orders"], row["revenue"]) for row in buckets],
+            [("Confirmed", 1, "40.00"), ("Confirmed", 1, "20.00"), ("Pending", 1, "10.00")],
+        )
+
+        response = self.client.get("/orders/analytics/?interval=week&status=Confirmed")
+        self.assertEqual(sum(row["orders"] for row in response.json()["buckets"]), 2)
+        response = self.client.get("/orders/analytics/?interval=hour")
+        self.assertEqual(len(response.json()["buckets"]), 2)
+        response = self.client.get("/orders/analytics/?interval=month")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductBulkUpsertTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="test")
+        self.lamp = Product.objects.create(name="Lamp", description="desc", price="10.00", stock=5)
+        self.client.force_login(self.admin)
+
+    def record(self, name, **fields):
+        return {"name": name, "description": "desc", "price": "1.00", "stock": 1, **fields}
+
+    def test_upserts_valid_rows_and_reports_the_rest(self):
+        payload = [
+            self.record("Lamp v2", id=self.lamp.pk, price="12.50"),
+            self.record("Desk"),
+            self.record("Broken", price="-1.00"),
+            self.record("Ghost", id=999),
+            self.record("Lamp v3", id=self.lamp.pk),
+            # a digit int() can't parse
+            self.record("Squared", id="²"),
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post("/products/bulk/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual(
+            [result["status"] for result in body["results"]],
+            ["updated", "created", "invalid", "invalid", "invalid", "invalid"],
+        )
+        self.assertEqual((body["created"], body["updated"], body["invalid"]), (1, 1, 4))
+        self.assertEqual(body["results"][2]["errors"], {"price": ["Price must be greater than 0."]})
+        self.assertEqual(body["results"][5]["errors"], {"id": ["A valid integer is required."]})
+        # one id lookup and one insert per kind, whatever the number of rows
+        self.assertEqual(
+            len([sql for sql in api_queries(captured) if '"api_product"' in sql]), 3
+        )
+        self.lamp.refresh_from_db()
+        self.assertEqual((self.lamp.name, self.lamp.price), ("Lamp v2", Decimal("12.50")))
+        self.assertEqual(Product.objects.get(pk=body["results"][1]["id"]).name, "Desk")
+        # the search index follows upserts like single writes
+        response = self.client.get("/products/?search=lamp")
+        self.assertEqual([product["name"] for product in response.json()["results"]], ["Lamp v2"])
+
+    def test_accepts_ndjson_and_invalidates_the_product_cache_once(self):
+        body = "\n".join(
+            json.dumps(self.record(f"Product {index}")) for index in range(3)
+        )
+        with mock.patch("apps.api.product_sync.invalidate_products_on_commit") as invalidate:
+            response = self.client.post(
+                "/products/bulk/", body, content_type="application/x-ndjson"
+            )
+        self.assertEqual(response.json()["created"], 3)
+        invalidate.assert_called_once()
+        self.assertEqual(Product.objects.count(), 4)
+
+        response = self.client.post(
+            "/products/bulk/", '{"name": "ok"}\nnot json', content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("line 2", response.json()["detail"])
+
+
+class ProductImageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="test"))
+
+    def upload(self, name="lamp.png"):
+        output = BytesIO()
+        Image.new("RGBA", (1200, 600), (200, 80, 20, 255)).save(output, "PNG")
+        image = SimpleUploadedFile(name, output.getvalue(), content_type="image/png")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/products/",
+                {"name": "Lamp", "description": "desc", "price": "9.99", "stock": 1, "image": image},
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Product.objects.get(pk=response.json()["id"])
+
+    def test_upload_builds_content_hashed_variants(self):
+        product = self.upload()
+        self.assertRegex(product.image.name, r"^products/[0-9a-f]{16}\.png$")
+        thumb = product.image_variants["thumb"]
+        self.assertEqual(set(thumb), {"webp", "jpg"})
+        with default_storage.open(thumb["webp"]) as file:
+            self.assertEqual(Image.open(file).size, (200, 100))
+
+        images = self.client.get(f"/products/{product.pk}/").json()["images"]
+        self.assertEqual(images["original"], f"/media/{product.image.name}")
+        self.assertEqual(images["medium"]["webp"], f"/media/{product.image_variants['medium']['webp']}")
+        # the list's fast path renders the same URLs
+        listed = self.client.get("/products/").json()["results"]
+        self.assertEqual(listed[0]["images"], images)
+
+        # same bytes, same names: the second upload reuses the files
+        again = self.upload("copy.png")
+        self.assertEqual(again.image.name, product.image.name)
+        self.assertEqual(again.image_variants["thumb"], thumb)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, "products"))), 2)
+
+    def test_variants_are_dropped_with_the_image(self):
+        product = self.upload()
+        product.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+        self.assertIsNone(self.client.get(f"/products/{product.pk}/").json()["images"])
+
+    def test_only_image_changes_schedule_variants(self):
+        with mock.patch("apps.api.signals.schedule_variants") as schedule:
+            product = self.upload()
+            schedule.assert_called_once()
+            # saves before the variants are written don't queue them again
+            with self.captureOnCommitCallbacks(execute=True):
+                product.stock = 2
+                product.save()
+                Product.objects.get(pk=product.pk).save()
+        schedule.assert_called_once()
+
+
+class ProductImageRequestTestCase(TransactionTestCase):
+    """Outside a test transaction on_commit runs at once, inside the request."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="test"))
+
+    def test_upload_builds_variants_within_the_query_budget(self):
+        output = BytesIO()
+        Image.new("RGB", (400, 300), (20, 80, 200)).save(output, "PNG")
+        image = SimpleUploadedFile("lamp.png", output.getvalue(), content_type="image/png")
+        response = self.client.post(
+            "/products/",
+            {"name": "Lamp", "description": "desc", "price": "9.99", "stock": 1, "image": image},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product = Product.objects.get()
+        self.assertEqual(product.image_variants["source"], product.image.name)
+
+        response = self.client.patch(
+            f"/products/{product.pk}/", {"stock": 3}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+attempts_seen = []
+
+
+@task("tests.flaky", max_attempts=3)
+def flaky_task(fail_times):
+    attempts_seen.append(fail_times)
+    if len(attempts_seen) <= fail_times:
+        raise RuntimeError("downstream is down")
+
+
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        attempts_seen.clear()
+        self.user = User.objects.create_user(
+            username="buyer", password="test", email="buyer@example.com"
+        )
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=5
+        )
+        self.client.force_login(self.user)
+
+    def test_order_side_effects_are_queued_not_run_inline(self):
+        response = self.client.post(
+            "/orders/",
+            {
+                "user": self.user.pk,
+                "status": "Confirmed",
+                "items": [{"product": self.product.pk, "quantity": 2}],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Task.objects.values_list("name", flat=True)),
+            ["orders.notify", "orders.record_rollups", "orders.record_sales"],
+        )
+        self.assertFalse(ProductSales.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(ProductSales.objects.get().units_sold, 2)
+        self.assertEqual(OrderRollup.objects.get().orders, 1)
+        self.assertEqual(mail.outbox[0].to, ["buyer@example.com"])
+        self.assertFalse(Task.objects.exclude(status=Task.Status.DONE).exists())
+
+        order = Order.objects.get()
+        order.status = Order.StatusChoices.CANCELLED
+        order.save()
+        call_command("run_tasks", "--once", stdout=StringIO())
+        self.assertEqual(ProductSales.objects.get().units_sold, 0)
+        self.assertIn("cancelled", mail.outbox[-1].subject)
+
+    def test_failed_tasks_back_off_then_give_up(self):
+        job = Task.objects.create(name="tests.flaky", payload={"fail_times": 5})
+        self.assertTrue(run_task(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.Status.QUEUED, 1))
+        self.assertIn("downstream is down", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        # not due yet
+        self.assertEqual(run_pending(), 0)
+
+        for attempt in (2, 3):
+            Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.Status.FAILED, 3))
+        self.assertEqual(len(attempts_seen), 3)
+
+    def test_abandoned_running_tasks_are_picked_up_again(self):
+        job = Task.objects.create(
+            name="tests.flaky",
+            payload={"fail_times": 0},
+            status=Task.Status.RUNNING,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.Status.DONE)
+
+
+class IdempotencyKeyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="test")
+        self.product = Product.objects.create(
+            name="Lamp", description="desc", price="10.00", stock=5
+        )
+        self.client.force_login(self.user)
+        self.body = {
+            "user": self.user.pk,
+            "status": "Pending",
+            "items": [{"product": self.product.pk, "quantity": 2}],
+        }
+
+    def post(self, body, key="order-1"):
+        return self.client.post(
+            "/orders/", body, content_type="application/json", headers={"Idempotency-Key": key}
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(self.body)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        retry = self.post(self.body)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get().stock, 3)
+
+        self.assertEqual(self.post(self.body, key="order-2").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+        reused = self.post({**self.body, "status": "Confirmed"})
+        self.assertEqual(reused.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_failed_request_releases_its_key(self):
+        response = self.post({**self.body, "items": [{"product": self.product.pk, "quantity": 9}]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post(self.body).status_code, status.HTTP_201_CREATED)
+
+    def test_duplicate_waits_for_the_in_flight_request(self):
+        first = self.post(self.body)
+        row = IdempotencyKey.objects.get()
+        stored = (row.status_code, row.response)
+        IdempotencyKey.objects.filter(pk=row.pk).update(status_code=None, response=None)
+
+        with mock.patch("apps.api.idempotency.time.sleep"):
+            self.assertEqual(self.post(self.body).status_code, status.HTTP_409_CONFLICT)
+
+        def first_request_finishes(seconds):
+            IdempotencyKey.objects.filter(pk=row.pk).update(
+                status_code=stored[0], response=stored[1]
+            )
+
+        with mock.patch("apps.api.idempotency.time.sleep", side_effect=first_request_finishes):
+            retry = self.post(self.body)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_form_posts_are_fingerprinted_after_the_csrf_check(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = "a" * 32
+        client.cookies["csrftoken"] = token
+        # twice: a failed request leaves no key behind
+        for _ in range(2):
+            response = client.post(
+                "/orders/",
+                {"user": self.user.pk, "csrfmiddlewaretoken": token},
+                headers={"Idempotency-Key": "form-1"},
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_claim_reraises_other_integrity_errors(self):
+        with mock.patch.object(
+            IdempotencyKey.objects, "create", side_effect=IntegrityError("FOREIGN KEY")
+        ):
+            with self.assertRaises(IntegrityError):
+                claim(self.user, "order-1", "digest")
+
+
+class CachedJWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        cached_users.clear()
+        self.user = User.objects.create_user(username="buyer", password="test")
+        response = self.client.post(
+            "/api/token/", {"username": "buyer", "password": "test"}, content_type="application/json"
+        )
+        self.tokens = response.json()
+
+    def get_orders(self, access=None, path="/orders/"):
+        access = access or self.tokens["access"]
+        return self.client.get(path, headers={"Authorization": f"Bearer {access}"})
+
+    def test_user_is_cached_until_it_changes(self):
+        first = self.get_orders()
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        cached = self.get_orders()
+        self.assertEqual(int(cached["X-Query-Count"]), int(first["X-Query-Count"]) - 1)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_orders().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_tokens_are_rejected(self):
+        self.assertEqual(self.get_orders().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_orders(path="/async/orders/").status_code, status.HTTP_200_OK)
+        with mock.patch("apps.api.authentication.time.time", return_value=time.time() + 1):
+            response = self.client.post(
+                "/api/token/revoke/", headers={"Authorization": f"Bearer {self.tokens['access']}"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_orders().status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.get_orders(path="/async/orders/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+        response = self.client.post(
+            "/api/token/refresh/", {"refresh": self.tokens["refresh"]}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_right_after_revoking_is_accepted(self):
+        self.client.post(
+            "/api/token/revoke/", headers={"Authorization": f"Bearer {self.tokens['access']}"}
+        )
+        # usually issued within the cutoff second, its whole-second iat equals it
+        tokens = self.client.post(
+            "/api/token/", {"username": "buyer", "password": "test"}, content_type="application/json"
+        ).json()
+        self.assertEqual(self.get_orders(tokens["access"]).status_code, status.HTTP_200_OK)
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_stateless_users_come_from_the_token_claims(self):
+        other = User.objects.create_user(username="other", password="test")
+        Order.objects.create(user=other)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        refreshed = self.client.post(
+            "/api/token/refresh/", {"refresh": self.tokens["refresh"]}, content_type="application/json"
+        ).json()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_orders(refreshed["access"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if "api_user" in q["sql"]])
+        # is_staff comes from the refreshed claims, staff see everyone's orders
+        self.assertEqual(len(response.json()), 1)
+
+
+class ProductionSettingsTestCase(TestCase):
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return importlib.reload(importlib.import_module("ecommerce.settings_production"))
+
+    def test_drops_dev_apps_and_renders_json_only(self):
+        production = self.load(DJANGO_SECRET_KEY="s3cret", DJANGO_ALLOWED_HOSTS="api.example.com")
+        self.assertFalse(production.DEBUG)
+        self.assertEqual(production.ALLOWED_HOSTS, ["api.example.com"])
+        self.assertFalse(set(production.INSTALLED_APPS) & production.DEV_APPS)
+        self.assertIn("apps.api", production.INSTALLED_APPS)
+        self.assertNotIn("django.contrib.messages.middleware.MessageMiddleware", production.MIDDLEWARE)
+        self.assertEqual(
+            production.REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"],
+            ["apps.api.renderers.FastJSONRenderer"],
+        )
+
+    def test_requires_a_secret_key(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("DJANGO_SECRET_KEY", None)
+            with self.assertRaises(ImproperlyConfigured):
+                self.load()
+
+
+class FastJSONTestCase(TestCase):
+    data = {
+        "order_id": uuid.UUID("6f1c1b8e-8f3e-4c55-9a59-0d1f4f3c2b7a"),
+        "create_at": timezone.make_aware(datetime(2026, 3, 1, 12, 30, 5, 123456), dt_timezone.utc),
+        "total_price": Decimal("1234.50"),
+        "prices": [Decimal("0.10"), Decimal("19.99"), 3, 2.5, None, True],
+        "name": "Lampe – édition \u2028 \"spéciale\"\n\x00",
+        1: "int key",
+    }
+
+    def test_renders_the_same_bytes_as_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, "application/json; indent=4"),
+            JSONRenderer().render(self.data, "application/json; indent=4"),
+        )
+        with mock.patch("apps.api.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_parses_like_drf(self):
+        body = JSONRenderer().render(self.data)[:-1] + b',"big":123456789012345678901234567890}'
+        parsed = FastJSONParser().parse(BytesIO(body))
+        self.assertEqual(parsed, JSONParser().parse(BytesIO(body)))
+        self.assertEqual(parsed["big"], 123456789012345678901234567890)
+        for invalid in (b'{"price": NaN}', b'{"a": 1,}', b"\xef\xbb\xbf{}"):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(BytesIO(invalid))
+
+    def test_api_responses_are_unchanged(self):
+        user = User.objects.create_user(username="buyer", password="test")
+        product = Product.objects.create(name="Lamp", description="desc", price="10.00", stock=5)
+        self.client.force_login(user)
+        self.client.post(
+            "/orders/",
+            {"user": user.pk, "items": [{"product": product.pk, "quantity": 2}]},
+            content_type="application/json",
+        )
+        response = self.client.get("/orders/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response.content, JSONRenderer().render(response.json()))
+        self.assertEqual(response.json()[0]["total_price"], 20.0)
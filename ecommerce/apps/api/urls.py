@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 from rest_framework.routers import DefaultRouter
 
@@ -8,10 +8,25 @@ urlpatterns = [
     path("products/", views.ProductListCreateApiView.as_view()),
     # path("products/create/", views.ProductCreateApiView.as_view()),
     path("products/info/", views.ProductInfoListApiView.as_view()),
+    path("products/bulk/", views.ProductBulkUpsertApiView.as_view()),
+    path("products/bestsellers/", views.ProductBestsellersApiView.as_view()),
+    path("products/<int:product_id>/sales/", views.ProductSalesApiView.as_view()),
     path(
         "products/<int:product_id>/",
         views.ProductRetrieveUpdateDestroyApiView.as_view(),
     ),
+    # before the router, whose order detail route would take "analytics" as a pk
+    path("orders/analytics/", views.OrderAnalyticsApiView.as_view()),
+    path("profiling/latency/", views.LatencyHistogramApiView.as_view()),
+    # Async-native read-only endpoints (serve under ASGI)
+    path("async/products/", async_views.AsyncProductListView.as_view()),
+    path("async/products/info/", async_views.AsyncProductInfoView.as_view()),
+    path(
+        "async/products/<int:product_id>/",
+        async_views.AsyncProductDetailView.as_view(),
+    ),
+    path("async/orders/", async_views.AsyncOrderListView.as_view()),
+    path("async/orders/<uuid:pk>/", async_views.AsyncOrderDetailView.as_view()),
     # On using Function Based Views
     # path("products/", views.product_list),
     # path("products/info/", views.product_info),
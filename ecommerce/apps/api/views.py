@@ -1,22 +1,44 @@
-from django.db.models import Max
-from django.http import JsonResponse
+from django.db.models import Avg, Count, Max, Min, Q, Sum, prefetch_related_objects
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
 # ViewSets
-from rest_framework import filters, generics, mixins, viewsets
+from rest_framework import filters, generics, mixins, status, viewsets
 from rest_framework.decorators import api_view, action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from silk.profiling.profiler import silk_profile
 
+from apps.api.analytics import order_series
+from apps.api.authentication import revoke_tokens
+from apps.api.cache import cache_product_response
+from apps.api.exports import stream_orders_csv, stream_orders_ndjson
+from apps.api.fast_serializers import (
+    product_rows,
+    serialize_orders,
+    serialize_products,
+)
 from apps.api.filters import InStockFilterBackend, OrderFilter, ProductFilter
-from apps.api.models import Order, Product
+from apps.api.idempotency import idempotent
+from apps.api.models import Order, Product, ProductSales
+from apps.api.pagination import (
+    ProductInfoPagination,
+    ProductKeysetPagination,
+    ProductPageNumberPagination,
+)
+from apps.api.parsers import FastJSONParser, NDJSONParser
+from apps.api.product_sync import upsert_products, validate_records
+from apps.api.profiling import histograms
+from apps.api.routers import ReplicaReadMixin
+from apps.api.search import FullTextSearchFilter
 from apps.api.serializers import (
+    OrderAnalyticsQuerySerializer,
+    OrderBucketSerializer,
     OrderSerializer,
     ProductInfoSerializer,
+    ProductSalesSerializer,
     ProductSerializer,
     OrderCreateSerializer,
 )
@@ -24,7 +46,7 @@ from apps.api.serializers import (
 # Classed based Views
 
 
-class ProductListCreateApiView(generics.ListCreateAPIView):
+class ProductListCreateApiView(ReplicaReadMixin, generics.ListCreateAPIView):
     """Class-based view for listing and creating products."""
 
     queryset = Product.objects.order_by("pk")
@@ -32,17 +54,41 @@ class ProductListCreateApiView(generics.ListCreateAPIView):
     # filterset_fields = ["name", "price"]
     filterset_class = ProductFilter
     filter_backends = [
-        filters.SearchFilter,
+        FullTextSearchFilter,
         filters.OrderingFilter,
         DjangoFilterBackend,
         InStockFilterBackend,
     ]
     search_fields = ["name", "description"]
     ordering_fields = ["name", "price"]
-    pagination_class = PageNumberPagination
-    pagination_class.page_size = 2
-    pagination_class.page_size_query_param = "size"
-    pagination_class.max_page_size = 5
+    pagination_class = ProductPageNumberPagination
+    # ?pagination=keyset (or any ?cursor=) switches to seek-based pages
+    keyset_pagination_class = ProductKeysetPagination
+    # QueryBudgetMiddleware; budgets include up to 2 auth queries (session + user),
+    # and the image variants' UPDATE when they're built inline (no workers)
+    query_budget = {"get": 5, "post": 4}
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "keyset" or "cursor" in params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    @cache_product_response("product-list")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # same JSON as ProductSerializer, built from .values() rows
+        queryset = product_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_products(page))
+        return Response(serialize_products(list(queryset)))
 
     """Customising permission to allow only authenticated users to create products,
     while allowing anyone to view the list of products.
@@ -59,6 +105,12 @@ class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView)
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     lookup_url_kwarg = "product_id"
+    # +1 on writes replacing the image, see ProductListCreateApiView
+    query_budget = {"get": 3, "put": 5, "patch": 5, "delete": 6}
+
+    @cache_product_response("product-detail")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -67,6 +119,94 @@ class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView)
         return super().get_permissions()
 
 
+class ProductBulkUpsertApiView(APIView):
+    """Create or replace many products from a JSON list or an NDJSON body.
+
+    Records with an `id` replace that product, the others are created.
+    Invalid records are reported and skipped, the response has a result per
+    record in input order.
+    """
+
+    permission_classes = [IsAdminUser]
+    parser_classes = [FastJSONParser, NDJSONParser]
+    chunk_size = 1000
+    max_records = 5000
+    # auth (2) + the id lookup, then up to two statements per chunk
+    query_budget = 3 + 2 * (max_records // chunk_size)
+
+    def post(self, request):
+        records = request.data
+        if not isinstance(records, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of products."]})
+        if len(records) > self.max_records:
+            raise ValidationError(
+                {"non_field_errors": [f"At most {self.max_records} products per request."]}
+            )
+        rows, results = validate_records(records)
+        upsert_products(rows, results, chunk_size=self.chunk_size)
+        counts = {"created": 0, "updated": 0, "invalid": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return Response({**counts, "results": results})
+
+
+class ProductBestsellersApiView(ReplicaReadMixin, generics.ListAPIView):
+    """Best-selling products from ProductSales, by units or `?by=revenue`.
+
+    `?limit=` picks how many (default 10, at most 100).
+    """
+
+    serializer_class = ProductSalesSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = None
+    default_limit = 10
+    max_limit = 100
+    query_budget = 3
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        return min(max(limit, 1), self.max_limit)
+
+    def get_queryset(self):
+        field = "revenue" if self.request.query_params.get("by") == "revenue" else "units_sold"
+        return (
+            ProductSales.objects.filter(units_sold__gt=0)
+            .select_related("product")
+            .order_by(f"-{field}", "product")[: self.get_limit()]
+        )
+
+
+class ProductSalesApiView(ReplicaReadMixin, generics.RetrieveAPIView):
+    """Sales figures of one product, zeros if it never sold."""
+
+    serializer_class = ProductSalesSerializer
+    permission_classes = [IsAdminUser]
+    query_budget = 3
+
+    def get_object(self):
+        product = get_object_or_404(
+            Product.objects.select_related("sales"), pk=self.kwargs["product_id"]
+        )
+        try:
+            return product.sales
+        except ProductSales.DoesNotExist:
+            return ProductSales(product=product)
+
+
+class TokenRevokeApiView(APIView):
+    """Revoke every JWT of the current user issued so far ("log out everywhere")."""
+
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
+
+    def post(self, request):
+        revoke_tokens(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 # class OrderListApiView(generics.ListAPIView):
 #     queryset = Order.objects.prefetch_related(
 #         "items__product",
@@ -74,16 +214,37 @@ class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView)
 #     serializer_class = OrderSerializer
 
 
-class ProductInfoListApiView(APIView):
-    def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductInfoSerializer(
-            {
-                "products": products,
-                "count": len(products),
-                "max_price": products.aggregate(max_price=Max("price"))["max_price"],
-            }
+class ProductInfoListApiView(ReplicaReadMixin, APIView):
+    """Catalog stats plus a keyset-paginated page of products.
+
+    All the stats come from a single aggregate query; `?products=false`
+    skips the product page entirely.
+    """
+
+    pagination_class = ProductInfoPagination
+    ordering_fields = ["name", "price"]
+    query_budget = 4
+
+    def get_stats(self):
+        return Product.objects.aggregate(
+            count=Count("pk"),
+            max_price=Max("price"),
+            min_price=Min("price"),
+            avg_price=Avg("price"),
+            total_stock=Sum("stock"),
+            in_stock_count=Count("pk", filter=Q(stock__gt=0)),
         )
+
+    @cache_product_response("product-info", all_stock=True)
+    def get(self, request):
+        data = self.get_stats()
+        if request.query_params.get("products", "").lower() not in ("0", "false"):
+            paginator = self.pagination_class()
+            data["products"] = paginator.paginate_queryset(
+                Product.objects.order_by("pk"), request, view=self
+            )
+            data["next"] = paginator.get_next_link()
+        serializer = ProductInfoSerializer(data)
         return Response(serializer.data)
 
     # Generic Views + Mixins
@@ -129,17 +290,17 @@ class ProductInfoListApiView(APIView):
     #         return self.list(request, *args, **kwargs)
 
     # class UserOrderListApiView(mixins.ListModelMixin, generics.GenericAPIView):
-    queryset = Order.objects.prefetch_related(
-        "items__product",
-    )
-    serializer_class = OrderSerializer
-    permission_classes = [IsAuthenticated]
+    #     queryset = Order.objects.prefetch_related(
+    #         "items__product",
+    #     )
+    #     serializer_class = OrderSerializer
+    #     permission_classes = [IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
-        qs = super().get_queryset()
-        user_qs = qs.filter(user=request.user)
-        self.queryset = user_qs
-        return self.list(request, *args, **kwargs)
+    #     def get(self, request, *args, **kwargs):
+    #         qs = super().get_queryset()
+    #         user_qs = qs.filter(user=request.user)
+    #         self.queryset = user_qs
+    #         return self.list(request, *args, **kwargs)
 
 
 # class ProductInfoListApiView(mixins.ListModelMixin, generics.GenericAPIView):
@@ -206,16 +367,35 @@ class ProductInfoListApiView(APIView):
 # Views For Orders using ViewSets
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Order.objects.prefetch_related("items__product")
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = None
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = OrderFilter
+    ordering_fields = ["create_at", "total_price"]
+    export_chunk_size = 500
+    replica_actions = {"list", "retrieve"}
+    # create/update/destroy touch stock once per product line, budgets allow a
+    # few; other bookkeeping is queued in one INSERT (apps.api.order_events),
+    # except on delete where sales and rollups are updated inline. An
+    # Idempotency-Key adds two to creates: claiming it and storing the response.
+    # No budget for export: it queries while the response streams, once
+    # QueryBudgetMiddleware is done
+    query_budget = {
+        "list": 4,
+        "retrieve": 5,
+        "user_order": 4,
+        "create": 12,
+        "bulk_create": 16,
+        "update": 14,
+        "partial_update": 14,
+        "destroy": 17,
+    }
 
     def get_serializer_class(self):
-        if self.action == "create":
+        if self.action in ("create", "bulk_create"):
             return OrderCreateSerializer
         return super().get_serializer_class()
 
@@ -232,6 +412,96 @@ class OrderViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def user_order(self, request):
-        self.get_queryset().filter(user=request.user)
-        serializer = self.get_serializer(self.queryset, many=True)
+        queryset = self.filter_queryset(self.get_queryset().filter(user=request.user))
+        return Response(serialize_orders(queryset))
+
+    def list(self, request, *args, **kwargs):
+        # same JSON as OrderSerializer in two queries, without model instances
+        return Response(serialize_orders(self.filter_queryset(self.get_queryset())))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        # DRF just drops the stale prefetch here, which then loads each
+        # item's product one query at a time; refetch both in two queries
+        instance._prefetched_objects_cache = {}
+        prefetch_related_objects([instance], "items__product")
         return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @idempotent
+    def bulk_create(self, request):
+        """Create a list of orders in one request and one transaction."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Stream the (filtered) orders as NDJSON, or CSV with `?as=csv`.
+
+        Orders are read with a chunked iterator that prefetches items and
+        products per chunk, and each row is written as soon as it's built,
+        so memory stays flat however many orders match.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by("create_at", "pk")
+        orders = queryset.iterator(chunk_size=self.export_chunk_size)
+
+        if request.query_params.get("as") == "csv":
+            response = StreamingHttpResponse(
+                stream_orders_csv(orders), content_type="text/csv"
+            )
+            response["Content-Disposition"] = 'attachment; filename="orders.csv"'
+        else:
+            response = StreamingHttpResponse(
+                stream_orders_ndjson(orders), content_type="application/x-ndjson"
+            )
+            response["Content-Disposition"] = 'attachment; filename="orders.ndjson"'
+        return response
+
+
+class OrderAnalyticsApiView(ReplicaReadMixin, APIView):
+    """Orders and revenue per `?interval=` (hour, day, week) and status.
+
+    Served from the hourly OrderRollup rows, so a year of days is one small
+    aggregate whatever the number of orders. `?start=`/`?end=` bound the
+    range (default: a window sized for the interval, up to now) and
+    `?status=` keeps one status.
+    """
+
+    permission_classes = [IsAdminUser]
+    query_budget = 3
+
+    def get(self, request):
+        params = OrderAnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        rows = order_series(query["interval"], query["start"], query["end"], query.get("status"))
+        return Response(
+            {
+                "interval": query["interval"],
+                "start": params.fields["start"].to_representation(query["start"]),
+                "end": params.fields["end"].to_representation(query["end"]),
+                "buckets": OrderBucketSerializer(rows, many=True).data,
+            }
+        )
+
+
+class LatencyHistogramApiView(APIView):
+    """Per-view latency histograms from the sampling profiler (this process only)."""
+
+    permission_classes = [IsAdminUser]
+    query_budget = 2
+
+    def get(self, request):
+        return Response(histograms.snapshot())
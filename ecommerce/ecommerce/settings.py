@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = sys.argv[1:2] == ["test"]
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -55,9 +59,20 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "silk.middleware.SilkyMiddleware",
+    "apps.api.profiling.SamplingProfilerMiddleware",
+    "apps.api.middleware.QueryBudgetMiddleware",
+    "apps.api.middleware.ReplicaPinMiddleware",
 ]
 
+# silk writes every request, query and (with SILKY_PYTHON_PROFILER) a full
+# profile to the database; keep it for local debugging, the sampling
+# profiler above is the one that's always on
+SILK_ENABLED = False
+if SILK_ENABLED:
+    # outside the accounting middlewares, so they don't time silk itself
+    profiler = MIDDLEWARE.index("apps.api.profiling.SamplingProfilerMiddleware")
+    MIDDLEWARE.insert(profiler, "silk.middleware.SilkyMiddleware")
+
 ROOT_URLCONF = "ecommerce.urls"
 
 TEMPLATES = [
@@ -85,9 +100,63 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # persistent connections, checked before reuse. wsgi.py turns them on
+        # (60s); under ASGI each request may run on a new thread, which would
+        # leave a connection open per thread, so it stays 0 there: use a pool
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas, see apps/api/routers.py. Locally a replica can be a copy of
+# the sqlite file (cp db.sqlite3 replica1.sqlite3) or a Postgres standby:
+#
+# DATABASES["replica1"] = {
+#     "ENGINE": "django.db.backends.sqlite3",
+#     "NAME": BASE_DIR / "replica1.sqlite3",
+#     "TEST": {"MIRROR": "default"},
+# }
+#
+# On Postgres (Django 5.1+, psycopg 3) use the driver's pool rather than
+# CONN_MAX_AGE, the two can't be combined:
+#
+# DATABASES["default"] = {
+#     "ENGINE": "django.db.backends.postgresql",
+#     "NAME": "ecommerce",
+#     "HOST": "localhost",
+#     "PORT": 5432,
+#     "OPTIONS": {"pool": {"min_size": 2, "max_size": 20, "timeout": 10}},
+# }
+# DATABASES["replica1"] = {**DATABASES["default"], "PORT": 5433, "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["apps.api.routers.PrimaryReplicaRouter"]
+# how long a user reads from the primary after writing
+DATABASE_REPLICA_PIN_SECONDS = 5
+
+if TESTING:
+    # a mirror of default for the routing tests, which turn it on with
+    # override_settings(DATABASE_REPLICAS=["test_replica"])
+    DATABASES["test_replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS = []
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # product list/detail/info responses, LRU-culled past MAX_ENTRIES. Point
+    # this at django.core.cache.backends.redis.RedisCache when running more
+    # than one worker so invalidations are shared.
+    "api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api-responses",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +194,17 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded product images and their variants. Names are content hashes, so
+# the web server in front can serve /media/ with a one-year immutable
+# Cache-Control; runserver serves it when DEBUG is on.
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# apps.api.images: longest side in px of each variant, and the threads
+# building them (0: inline, in the request that saved the image)
+PRODUCT_IMAGE_VARIANTS = {"thumb": 200, "medium": 800}
+PRODUCT_IMAGE_WORKERS = 0 if TESTING else 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -133,17 +213,73 @@ AUTH_USER_MODEL = "api.User"
 
 SILKY_PYTHON_PROFILER = True
 
+# apps.api.profiling.SamplingProfilerMiddleware: a fraction of requests runs
+# under cProfile, slower ones are always recorded; records are flushed in
+# batches by a background thread (None: only on explicit flush())
+PROFILING_SAMPLE_RATE = 0.005
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_FLUSH_INTERVAL = None if TESTING else 5
+PROFILING_BUFFER_SIZE = 1000
+
+# apps.api.tasks: threads running new jobs right after their commit (0: only
+# `manage.py run_tasks` runs them), retry backoff base and cap in seconds,
+# and how long a claimed job may run before another worker takes it over
+TASK_QUEUE_WORKERS = 0 if TESTING else 2
+TASK_RETRY_BACKOFF = 5
+TASK_RETRY_MAX_DELAY = 3600
+TASK_TIMEOUT = 300
+
+# apps.api.idempotency: how long a response is replayed for its key, how
+# long an in-flight key blocks its duplicates, and how long a duplicate
+# waits for it before getting a 409 (seconds)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_WAIT = 10
+
+# order emails; set an SMTP backend in production
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "orders@example.com"
+
+# apps.api.middleware.QueryBudgetMiddleware: views declare `query_budget`,
+# strict mode raises on a blown budget or N+1 instead of logging it
+QUERY_BUDGET_STRICT = TESTING
+QUERY_BUDGET_N_PLUS_ONE = 5
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.api.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
+    # orjson-backed when it's installed, same bytes as DRF's (apps.api.renderers)
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5
 }
 
+SIMPLE_JWT = {
+    # access tokens carry the user claims JWT_STATELESS_USER reads, and
+    # refreshes reject revoked tokens (apps.api.authentication)
+    "TOKEN_OBTAIN_SERIALIZER": "apps.api.authentication.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "apps.api.authentication.TokenRefreshSerializer",
+}
+
+# apps.api.authentication.CachedJWTAuthentication: how many users each
+# process keeps and for how long (seconds), and whether to trust the
+# token's claims instead of loading the user at all
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 30
+JWT_STATELESS_USER = False
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Your Project API",
     "DESCRIPTION": "Your project description",
@@ -0,0 +1,79 @@
+"""
+Production settings: DJANGO_SETTINGS_MODULE=ecommerce.settings_production.
+
+Everything in ecommerce.settings, minus what only helps while developing:
+DEBUG (which keeps every SQL query of a request in memory), silk, the
+schema views, the admin and the messages framework, and the browsable API.
+What's left is what a JSON API worker needs, which also makes it start
+faster; `manage.py bench_startup` compares the two profiles.
+
+Requires DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma separated).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from ecommerce.settings import *  # noqa: F401,F403
+from ecommerce.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+except KeyError:
+    raise ImproperlyConfigured("Set DJANGO_SECRET_KEY for the production settings")
+ALLOWED_HOSTS = [host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
+
+DEV_APPS = {
+    "django.contrib.admin",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "silk",
+    "drf_spectacular",
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+
+DEV_MIDDLEWARE = {
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "silk.middleware.SilkyMiddleware",
+}
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DEV_MIDDLEWARE]
+SILK_ENABLED = False
+
+# hardly anything renders a template any more (Django's error pages);
+# whatever does is compiled once per process
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+            ],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    ["django.template.loaders.app_directories.Loader"],
+                ),
+            ],
+        },
+    },
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["apps.api.renderers.FastJSONRenderer"],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.api.parsers.FastJSONParser",
+        # product image uploads
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # drf_spectacular isn't installed; the schema is generated in development
+    "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
+}
+
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
@@ -1,33 +1,53 @@
-from django.contrib import admin
+from django.apps import apps
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path, include
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
-
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+from apps.api.views import TokenRevokeApiView
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("", include("apps.api.urls")),
-    path("silk/", include("silk.urls", namespace="silk")),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    # Optional UI:
-    path(
-        "api/schema/swagger-ui/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
-    path(
-        "api/schema/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
-        name="redoc",
-    ),
+    path("api/token/revoke/", TokenRevokeApiView.as_view(), name="token_revoke"),
 ]
+
+# the admin and the schema are dev tools the production settings leave out;
+# imported only when installed so workers don't pay for them at startup
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin/", admin.site.urls))
+
+if apps.is_installed("drf_spectacular"):
+    from drf_spectacular.views import (
+        SpectacularAPIView,
+        SpectacularRedocView,
+        SpectacularSwaggerView,
+    )
+
+    urlpatterns += [
+        path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+        # Optional UI:
+        path(
+            "api/schema/swagger-ui/",
+            SpectacularSwaggerView.as_view(url_name="schema"),
+            name="swagger-ui",
+        ),
+        path(
+            "api/schema/redoc/",
+            SpectacularRedocView.as_view(url_name="schema"),
+            name="redoc",
+        ),
+    ]
+
+if settings.SILK_ENABLED:
+    urlpatterns.append(path("silk/", include("silk.urls", namespace="silk")))
+
+# a no-op unless DEBUG; production serves MEDIA_ROOT from the web server
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
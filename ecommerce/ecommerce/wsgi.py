@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+# keep connections between requests, see DATABASES in settings.py
+os.environ.setdefault('DJANGO_CONN_MAX_AGE', '60')
 
 application = get_wsgi_application()